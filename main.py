@@ -1,14 +1,232 @@
+"""Fleet management command line.
+
+Each subcommand imports only what it needs: the GUI toolkit is loaded by `gui`
+alone, so headless runs work on machines without a display.
+
+    python main.py gui [--graph FILE]
+    python main.py run [--graph FILE] [--robots N] [--ticks N] [--zones N]
+    python main.py serve [--graph FILE] [--port N]
+    python main.py benchmark [--graph FILE]
+    python main.py compile-graph FILE [-o OUTPUT] [--hierarchy]
+"""
+import argparse
+import os
+import random
 import sys
-from PyQt5.QtWidgets import QApplication
-from models.nav_graph import NavGraph
-from gui.fleet_gui import FleetGUI
+import time
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_GRAPH = os.path.join(ROOT_DIR, "data", "nav_graph_1.json")
+HEADLESS_SCALE = 40  # Graph units to simulation units, close to the GUI's pixel scale
+
+
+def load_graph(path):
+    from src.models.nav_graph import NavGraph
+
+    return NavGraph(os.path.abspath(path))
+
+
+def make_simulation(graph, scale, event_log=None, idle_ttl=None, telemetry=None):
+    from src.models.fleet_simulation import FleetSimulation
+
+    vertex_map = {i: (x * scale, y * scale) for i, (x, y, name) in enumerate(graph.vertices)}
+    return FleetSimulation(graph, vertex_map, event_log, idle_ttl=idle_ttl, telemetry=telemetry)
+
+
+def run_fleet(simulation, robots, ticks, seed):
+    """Spawn robots and keep them busy with random tasks. Returns completed task count."""
+    rng = random.Random(seed)
+    vertex_count = len(simulation.graph.vertices)
+    for _ in range(robots):
+        simulation.spawn_robot(rng.randrange(vertex_count))
+    completed = 0
+    for _ in range(ticks):
+        for robot in simulation.robots:
+            if robot.status == robot.STATUS_IDLE:
+                simulation.assign_task(robot, rng.randrange(vertex_count))
+        for robot, old_status in simulation.step():
+            if robot.status == robot.STATUS_COMPLETE:
+                completed += 1
+    return completed
+
+
+def run_sharded(graph, args):
+    """Headless run split over one worker process per zone"""
+    from src.models.sharded_simulation import ShardedFleetSimulation
+
+    rng = random.Random(args.seed)
+    vertex_count = len(graph.vertices)
+    vertex_map = {i: (x * args.scale, y * args.scale) for i, (x, y, name) in enumerate(graph.vertices)}
+    simulation = ShardedFleetSimulation(graph, args.zones, vertex_map, capacity=max(args.robots, 1))
+    try:
+        for _ in range(args.robots):
+            simulation.spawn_robot(rng.randrange(vertex_count))
+        start = time.perf_counter()
+        for _ in range(args.ticks):
+            for robot_id, x, y, status, zone in simulation.robots():
+                if status == "IDLE":
+                    simulation.assign_task(robot_id, rng.randrange(vertex_count))
+            simulation.step()
+        elapsed = time.perf_counter() - start
+        print(f"{args.ticks} ticks with {args.robots} robots over {args.zones} zones in {elapsed:.3f}s "
+              f"({args.ticks / elapsed if elapsed else 0:.0f} ticks/s)")
+        print(f"Tasks completed: {simulation.completed}")
+        print(f"Final status: {simulation.status_counts()}")
+    finally:
+        simulation.close()
+
+
+def cmd_gui(args):
+    import tkinter as tk
+    from src.gui.fleet_gui import FleetGUI
+
+    root = tk.Tk()
+    root.title("Fleet Management System")
+    app = FleetGUI(root, load_graph(args.graph), idle_ttl=args.idle_ttl)
+    if not args.no_restore:
+        app.restore_latest_snapshot()  # Warm restart from the last fleet snapshot
+    root.mainloop()
+
+
+def cmd_run(args):
+    if args.zones > 1:
+        run_sharded(load_graph(args.graph), args)
+        return
+    event_log = None
+    if args.events:
+        from src.utils.event_log import EventLog
+
+        event_log = EventLog(args.events)
+    telemetry = None
+    if args.telemetry:
+        from src.utils.telemetry import TelemetryRecorder
+
+        telemetry = TelemetryRecorder(args.telemetry, idle_interval=args.idle_sample)
+    simulation = make_simulation(load_graph(args.graph), args.scale, event_log, args.idle_ttl, telemetry)
+    start = time.perf_counter()
+    completed = run_fleet(simulation, args.robots, args.ticks, args.seed)
+    elapsed = time.perf_counter() - start
+    if event_log is not None:
+        event_log.close()
+    if telemetry is not None:
+        telemetry.close()
+    counts = simulation.robots.status_counts()
+    print(f"{args.ticks} ticks with {args.robots} robots in {elapsed:.3f}s "
+          f"({args.ticks / elapsed if elapsed else 0:.0f} ticks/s)")
+    print(f"Tasks completed: {completed}")
+    print(f"Final status: {counts}")
+    if args.idle_ttl is not None:
+        print(f"Robots remaining: {len(simulation.robots)} of {args.robots}")
+
+
+def cmd_serve(args):
+    from src.api.server import run_server
+
+    run_server(os.path.abspath(args.graph), args.host, args.port, args.tick_interval, args.scale)
+
+
+def cmd_benchmark(args):
+    start = time.perf_counter()
+    graph = load_graph(args.graph)
+    print(f"Graph load: {(time.perf_counter() - start) * 1000:.2f} ms "
+          f"({len(graph.vertices)} vertices, {len(graph.lanes)} lanes)")
+
+    rng = random.Random(args.seed)
+    vertex_count = len(graph.vertices)
+    pairs = [(rng.randrange(vertex_count), rng.randrange(vertex_count)) for _ in range(args.queries)]
+    start = time.perf_counter()
+    for source, target in pairs:
+        graph.find_path(source, target)
+    elapsed = time.perf_counter() - start
+    method = "contraction hierarchy" if graph.hierarchy is not None else "BFS"
+    print(f"Path queries ({method}): {elapsed / len(pairs) * 1e6:.1f} us/query over {len(pairs)} queries")
+
+    simulation = make_simulation(graph, args.scale)
+    start = time.perf_counter()
+    run_fleet(simulation, args.robots, args.ticks, args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"Simulation: {args.ticks / elapsed:.0f} ticks/s with {args.robots} robots")
+
+
+def cmd_compile_graph(args):
+    graph = load_graph(args.graph)
+    output = graph.save_compiled(args.output or args.graph)
+    print(f"Compiled {len(graph.vertices)} vertices and {len(graph.lanes)} lanes to {output}")
+    if args.hierarchy:
+        from src.models.contraction_hierarchy import hierarchy_path
+
+        start = time.perf_counter()
+        graph.file_path = output
+        hierarchy = graph.build_hierarchy()
+        print(f"Built contraction hierarchy with {len(hierarchy.middle)} shortcuts in "
+              f"{time.perf_counter() - start:.2f}s to {hierarchy_path(output)}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Fleet management system")
+    subparsers = parser.add_subparsers(dest="command")
+
+    gui = subparsers.add_parser("gui", help="Launch the Tkinter GUI")
+    gui.add_argument("--graph", default=DEFAULT_GRAPH)
+    gui.add_argument("--no-restore", action="store_true", help="Start empty instead of restoring the last snapshot")
+    gui.add_argument("--idle-ttl", type=int, help="Reclaim robots idle this many ticks after finishing a task")
+    gui.set_defaults(func=cmd_gui)
+
+    run = subparsers.add_parser("run", help="Run a headless simulation")
+    run.add_argument("--graph", default=DEFAULT_GRAPH)
+    run.add_argument("--robots", type=int, default=10)
+    run.add_argument("--ticks", type=int, default=1000)
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--scale", type=float, default=HEADLESS_SCALE)
+    run.add_argument("--events", help="Write a replayable event log to this file")
+    run.add_argument("--idle-ttl", type=int, help="Reclaim robots idle this many ticks after finishing a task")
+    run.add_argument("--telemetry", help="Record robot trajectories to this telemetry file")
+    run.add_argument("--idle-sample", type=int, default=10,
+                     help="Sample robots that have not moved only every this many ticks")
+    run.add_argument("--zones", type=int, default=1,
+                     help="Partition the graph and simulate each zone in its own process; "
+                          "1 runs in this process without workers")
+    run.set_defaults(func=cmd_run)
+
+    serve = subparsers.add_parser("serve", help="Serve the local HTTP/JSON fleet API")
+    serve.add_argument("--graph", default=DEFAULT_GRAPH)
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--tick-interval", type=float, default=0.1)
+    serve.add_argument("--scale", type=float, default=HEADLESS_SCALE)
+    serve.set_defaults(func=cmd_serve)
+
+    benchmark = subparsers.add_parser("benchmark", help="Time graph loading, path queries and ticks")
+    benchmark.add_argument("--graph", default=DEFAULT_GRAPH)
+    benchmark.add_argument("--queries", type=int, default=1000)
+    benchmark.add_argument("--robots", type=int, default=50)
+    benchmark.add_argument("--ticks", type=int, default=500)
+    benchmark.add_argument("--seed", type=int, default=0)
+    benchmark.add_argument("--scale", type=float, default=HEADLESS_SCALE)
+    benchmark.set_defaults(func=cmd_benchmark)
+
+    compile_graph = subparsers.add_parser("compile-graph", help="Pre-parse a graph JSON file for fast loading")
+    compile_graph.add_argument("graph")
+    compile_graph.add_argument("-o", "--output")
+    compile_graph.add_argument("--hierarchy", action="store_true",
+                               help="Also preprocess a contraction hierarchy for fast path queries")
+    compile_graph.set_defaults(func=cmd_compile_graph)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        argv = ["gui"]  # Keep `python main.py` launching the GUI as before
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        if args.zones < 1:
+            parser.error("--zones must be at least 1")
+        if args.zones > 1 and (args.events or args.telemetry or args.idle_ttl is not None):
+            parser.error("--events, --telemetry and --idle-ttl are not supported with more than one zone")
+    args.func(args)
 
-def main():
-    app = QApplication(sys.argv)
-    nav_graph = NavGraph("nav_graph_2.json")  # Ensure this file exists
-    gui = FleetGUI(nav_graph)
-    gui.show()
-    sys.exit(app.exec_())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,129 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List
+
+
+class FleetAPIClient:
+    """Minimal asyncio client for FleetAPIServer, reusing one keep-alive connection"""
+
+    def __init__(self, host="127.0.0.1", port=8765):
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        if self._writer:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._writer = None
+
+    async def request(self, method, path, payload=None) -> Dict:
+        """Send one request and return the decoded JSON response"""
+        if self._writer is None:
+            await self.connect()
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self._writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+        await self._writer.drain()
+        status_line = await self._reader.readline()
+        status = int(status_line.split()[1])
+        length = 0
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        data = json.loads(await self._reader.readexactly(length))
+        if status != 200:
+            raise RuntimeError(f"{method} {path} failed ({status}): {data.get('error')}")
+        return data
+
+    async def status(self) -> Dict:
+        return await self.request("GET", "/status")
+
+    async def robots(self) -> List[Dict]:
+        return (await self.request("GET", "/robots"))["robots"]
+
+    async def spawn_robots(self, vertices) -> List[Dict]:
+        """Spawn one robot per vertex in a single request"""
+        return (await self.request("POST", "/robots", {"robots": [{"vertex": v} for v in vertices]}))["results"]
+
+    async def assign_tasks(self, tasks) -> List[Dict]:
+        """Assign (robot_id, destination) pairs in a single request"""
+        payload = {"tasks": [{"robot": r, "destination": d} for r, d in tasks]}
+        return (await self.request("POST", "/tasks", payload))["results"]
+
+    async def stream(self):
+        """Yield state delta messages from /stream until the server closes it"""
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        writer.write(f"GET /stream HTTP/1.1\r\nHost: {self.host}\r\n\r\n".encode())
+        await writer.drain()
+        while (await reader.readline()) not in (b"\r\n", b""):
+            pass  # Skip status line and headers
+        try:
+            while True:
+                size = int((await reader.readline()).strip() or b"0", 16)
+                if size == 0:
+                    break
+                chunk = await reader.readexactly(size + 2)  # Data plus trailing CRLF
+                yield json.loads(chunk[:-2])
+        finally:
+            writer.close()
+
+
+async def load_test(host, port, clients=8, requests=200, batch_size=50, vertex_count=None):
+    """Hammer the API with batched spawn/task requests and report throughput"""
+    if vertex_count is None:
+        probe = FleetAPIClient(host, port)
+        vertex_count = (await probe.status())["vertices"]
+        await probe.close()
+
+    async def worker(seed):
+        rng = random.Random(seed)
+        client = FleetAPIClient(host, port)
+        commands = 0
+        try:
+            for i in range(requests):
+                if i % 2 == 0:
+                    results = await client.spawn_robots(
+                        [rng.randrange(vertex_count) for _ in range(batch_size)])
+                    robot_ids = [r["id"] for r in results if "id" in r]
+                else:
+                    results = await client.assign_tasks(
+                        [(robot_id, rng.randrange(vertex_count)) for robot_id in robot_ids])
+                commands += len(results)
+        finally:
+            await client.close()
+        return commands
+
+    start = time.perf_counter()
+    commands = sum(await asyncio.gather(*(worker(seed) for seed in range(clients))))
+    elapsed = time.perf_counter() - start
+    total_requests = clients * requests
+    print(f"{total_requests} requests / {commands} commands in {elapsed:.2f}s: "
+          f"{total_requests / elapsed:.0f} req/s, {commands / elapsed:.0f} commands/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test a running fleet API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(load_test(args.host, args.port, args.clients, args.requests, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import asyncio
+import json
+import os
+import sys
+from typing import Dict, List
+
+from src.models.fleet_simulation import FleetSimulation
+from src.utils.state_stream import StateDeltaEncoder, StatePublisher
+
+MAX_BODY_SIZE = 1 << 20  # Largest request body accepted, in bytes
+STREAM_QUEUE_SIZE = 256  # Ticks buffered per streaming subscriber before it is resynced
+
+
+class HTTPError(Exception):
+    """Error response with an HTTP status code"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class FleetAPIServer:
+    """Local HTTP/JSON API over the simulation core, served from a single asyncio loop.
+
+    The simulation ticks on the same loop as the request handlers, so commands and
+    ticks never interleave and no locking is needed.
+
+    Endpoints:
+        GET  /status          tick, map size and robot counts by status
+        GET  /robots          full state of every robot
+        POST /robots          batch spawn: {"robots": [{"vertex": 3}, ...]}
+        POST /tasks           batch assign: {"tasks": [{"robot": "R1", "destination": 5}, ...]}
+                              or multi-stop: {"robot": "R1", "stops": [5, 9, 2], "ordered": false}
+        GET  /stream          chunked JSON lines: a keyframe, then per-tick deltas
+                              (see StateDeltaEncoder for the message format)
+    """
+
+    def __init__(self, simulation: FleetSimulation, host="127.0.0.1", port=8765, tick_interval=0.1):
+        self.simulation = simulation
+        self.host = host
+        self.port = port
+        self.tick_interval = tick_interval
+        self.publisher = StatePublisher(StateDeltaEncoder(simulation), asyncio.Queue, STREAM_QUEUE_SIZE)
+        self._server = None
+        self._tick_task = None
+
+    async def start(self):
+        """Start listening and ticking the simulation"""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]  # Resolve port 0
+        self._tick_task = asyncio.ensure_future(self._tick_loop())
+
+    async def stop(self):
+        """Stop ticking and close all connections"""
+        if self._tick_task:
+            self._tick_task.cancel()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        for queue in list(self.publisher.subscribers):
+            self.publisher.unsubscribe(queue)
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+    async def serve_forever(self):
+        """Run until cancelled"""
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def _tick_loop(self):
+        while True:
+            self.simulation.step()
+            if self.publisher.subscribers:
+                self.publisher.publish()
+            await asyncio.sleep(self.tick_interval)
+
+    def robot_state(self, robot) -> Dict:
+        """JSON view of a robot"""
+        return {
+            "id": robot.id,
+            "x": robot.x,
+            "y": robot.y,
+            "status": robot.status,
+            "vertex": robot.current_vertex,
+            "destination": robot.destination_vertex,
+            "stops": list(robot.stops),
+            "eta": round(self.simulation.eta(robot), 1),
+            "blocked_reason": robot.blocked_reason,
+        }
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, body, keep_alive = request
+                if method == "GET" and path == "/stream":
+                    await self._stream(writer)
+                    break
+                try:
+                    status, payload = 200, self._dispatch(method, path, body)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": e.message}
+                except Exception as e:
+                    print(f"Error: {method} {path} failed: {e!r}")
+                    status, payload = 500, {"error": "Internal server error"}
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except HTTPError as e:
+            self._write_response(writer, e.status, {"error": e.message}, False)
+        except Exception as e:
+            print(f"Error: Connection failed: {e!r}")
+            self._write_response(writer, 500, {"error": "Internal server error"}, False)
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        """Parse one HTTP/1.1 request. Returns None when the client closed the connection."""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, version = request_line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length < 0:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > MAX_BODY_SIZE:
+            raise HTTPError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+        return method, target.split("?", 1)[0], body, keep_alive
+
+    def _write_response(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode() + body)
+
+    def _parse_json(self, body, key) -> List[Dict]:
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Body is not valid JSON")
+        items = data.get(key) if isinstance(data, dict) else None
+        if not isinstance(items, list):
+            raise HTTPError(400, f"Expected a JSON object with a '{key}' list")
+        return items
+
+    def _dispatch(self, method, path, body):
+        routes = {
+            "/status": {"GET": self._get_status},
+            "/robots": {"GET": self._get_robots, "POST": self._spawn_robots},
+            "/tasks": {"POST": self._assign_tasks},
+        }
+        if path not in routes:
+            raise HTTPError(404, f"No such endpoint: {path}")
+        handler = routes[path].get(method)
+        if handler is None:
+            raise HTTPError(405, f"{method} not allowed on {path}")
+        return handler(body)
+
+    def _get_status(self, body):
+        return {"tick": self.simulation.tick, "vertices": len(self.simulation.graph.vertices),
+                "robots": len(self.simulation.robots), "status": self.simulation.robots.status_counts()}
+
+    def _get_robots(self, body):
+        return {"tick": self.simulation.tick,
+                "robots": [self.robot_state(robot) for robot in self.simulation.robots]}
+
+    def _spawn_robots(self, body):
+        vertex_count = len(self.simulation.graph.vertices)
+        results = []
+        for item in self._parse_json(body, "robots"):
+            vertex = item.get("vertex") if isinstance(item, dict) else None
+            if not isinstance(vertex, int) or not 0 <= vertex < vertex_count:
+                results.append({"error": f"Invalid vertex: {vertex!r}"})
+                continue
+            results.append({"id": self.simulation.spawn_robot(vertex).id})
+        return {"tick": self.simulation.tick, "results": results}
+
+    def _assign_tasks(self, body):
+        vertex_count = len(self.simulation.graph.vertices)
+        results = []
+        for item in self._parse_json(body, "tasks"):
+            if not isinstance(item, dict):
+                results.append({"error": "Task must be an object"})
+                continue
+            robot_id = item.get("robot")
+            robot = self.simulation.get_robot(robot_id) if isinstance(robot_id, str) else None
+            destination = item.get("destination")
+            stops = item.get("stops")
+            if robot is None:
+                results.append({"error": f"Unknown robot: {item.get('robot')!r}"})
+            elif stops is not None:
+                if not isinstance(stops, list) or not stops or not all(
+                        isinstance(stop, int) and 0 <= stop < vertex_count for stop in stops):
+                    results.append({"error": f"Invalid stops: {stops!r}"})
+                else:
+                    assigned = self.simulation.assign_stops(robot, stops, bool(item.get("ordered")))
+                    results.append({"robot": robot.id, "assigned": assigned, "stops": list(robot.stops)})
+            elif not isinstance(destination, int) or not 0 <= destination < vertex_count:
+                results.append({"error": f"Invalid destination: {destination!r}"})
+            else:
+                results.append({"robot": robot.id,
+                                "assigned": self.simulation.assign_task(robot, destination)})
+        return {"tick": self.simulation.tick, "results": results}
+
+    async def _stream(self, writer):
+        """Stream encoded ticks as chunked JSON lines until the client goes away"""
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+        queue = self.publisher.subscribe()
+        try:
+            while True:
+                data = await queue.get()
+                if data is None:
+                    break
+                writer.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+                await writer.drain()
+            writer.write(b"0\r\n\r\n")
+        finally:
+            self.publisher.unsubscribe(queue)
+
+
+def run_server(graph_path, host="127.0.0.1", port=8765, tick_interval=0.1, scale=40):
+    """Load a graph and serve the API until interrupted.
+
+    scale maps graph units to simulation units, as for headless runs, so robot
+    speeds and headways mean the same distances as there.
+    """
+    from src.models.nav_graph import NavGraph
+
+    graph = NavGraph(graph_path)
+    vertex_map = {i: (x * scale, y * scale) for i, (x, y, name) in enumerate(graph.vertices)}
+    simulation = FleetSimulation(graph, vertex_map)
+    server = FleetAPIServer(simulation, host, port, tick_interval)
+    print(f"Fleet API listening on http://{host}:{port}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    default_graph = os.path.join(os.path.dirname(__file__), "..", "..", "data", "nav_graph_1.json")
+    run_server(sys.argv[1] if len(sys.argv) > 1 else os.path.abspath(default_graph))
@@ -0,0 +1,42 @@
+import argparse
+import asyncio
+import time
+
+from src.api.client import FleetAPIClient
+from src.utils.state_stream import ViewerState
+
+
+async def watch(host="127.0.0.1", port=8765, interval=1.0):
+    """Mirror the fleet from the server's delta stream and print a summary every interval"""
+    state = ViewerState()
+    client = FleetAPIClient(host, port)
+    messages = 0
+    last_report = time.time()
+    async for message in client.stream():
+        state.apply(message)
+        messages += 1
+        now = time.time()
+        if now - last_report >= interval:
+            counts = {}
+            for x, y, status in state.robots.values():
+                counts[status] = counts.get(status, 0) + 1
+            print(f"tick {state.tick}: {len(state.robots)} robots {counts}, "
+                  f"{len(state.occupied_lanes)} lanes / {len(state.occupied_vertices)} vertices occupied, "
+                  f"{messages} messages")
+            messages = 0
+            last_report = now
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lightweight console viewer for the fleet API stream")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    try:
+        asyncio.run(watch(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
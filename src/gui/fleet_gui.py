@@ -1,18 +1,27 @@
 import tkinter as tk
-from tkinter import Canvas, Frame, Label, Button, Listbox, messagebox
-from src.models.nav_graph import NavGraph
+from tkinter import Canvas, Frame, Label, Button, Listbox
 from src.models.robot import Robot
-from src.models.traffic_manager import TrafficManager
+from src.models.fleet_simulation import FleetSimulation
+from src.utils.event_bus import (RobotSpawned, StatusChanged, TaskAssigned, TaskCompleted, TaskRejected,
+                                 TrafficWait)
+from src.utils.event_log import EventLog
+from src.utils.telemetry import TelemetryRecorder
 from src.utils.logger import RobotLogger
+from src.utils.snapshot import SnapshotWriter
+from datetime import datetime
 import random
 import time
 
 class FleetGUI:
-    def __init__(self, root, graph):
+    def __init__(self, root, graph, idle_ttl=None):
         self.root = root
         self.graph = graph
         self.logger = RobotLogger()  # Initialize logger
-        self.traffic_manager = TrafficManager()  # Initialize traffic manager
+        session = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.event_log = EventLog.for_session(timestamp=session)  # Replayable event log
+        self.telemetry = TelemetryRecorder.for_session(timestamp=session)  # Robot trajectories
+        # Periodic fleet snapshots for warm restarts and replay seeking
+        self.snapshot_writer = SnapshotWriter(history_name=f"history_{session}")
         
         # Define color scheme
         self.colors = {
@@ -160,20 +169,45 @@ class FleetGUI:
         # Notification system
         self.notifications = []
         self.notification_window = None
+        self.notification_label = None
+        self.notification_frame = None
+        self.notification_close_job = None
         self.last_notification_time = 0
         self.notification_cooldown = 3  # seconds
         
         # Rest of the initialization
-        self.robots = []
-        self.vertex_map = {}
         self.margin = 50 
         self.scale_factor, self.offset_x, self.offset_y = self.calculate_scaling()
+        self.vertex_map = {i: self.transform_coordinates(x, y)
+                           for i, (x, y, name) in enumerate(self.graph.vertices)}
+        self.sim = FleetSimulation(self.graph, self.vertex_map, self.event_log, idle_ttl=idle_ttl,
+                                   telemetry=self.telemetry)  # Simulation core
         self.selected_robot = None
+        self.pending_stops = []  # Shift-clicked stops for the selected robot's next task
         self.robot_colors = {}
+        self.listed_robot_ids = []  # Robot ID shown on each robot listbox row
+        # Notifications and logging consume the simulation's event bus on their own cadence
+        self.sim.events.subscribe(self.on_fleet_events, (StatusChanged, TaskRejected), every=5)
+        vertex_names = [name for x, y, name in self.graph.vertices]
+        self.sim.events.subscribe(lambda events: self.logger.log_fleet_events(events, vertex_names),
+                                  (RobotSpawned, TaskAssigned, StatusChanged, TaskCompleted, TrafficWait),
+                                  every=10)
         self.draw_graph()
         self.canvas.bind("<Button-1>", self.handle_click)
+        self.canvas.bind("<Shift-Button-1>", self.handle_shift_click)  # Queue a stop of a multi-stop task
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         self.update_robots()
 
+    @property
+    def robots(self):
+        """Robots owned by the simulation core"""
+        return self.sim.robots
+
+    @property
+    def traffic_manager(self):
+        """Traffic manager owned by the simulation core"""
+        return self.sim.traffic_manager
+
     def create_info_labels(self):
         """Create labels for robot information display"""
         fields = ['ID', 'Status', 'Current Location', 'Destination', 'Path Length']
@@ -219,6 +253,8 @@ class FleetGUI:
             
             dest_vertex = robot.destination_vertex
             dest_name = self.graph.vertices[dest_vertex][2] if dest_vertex is not None else "None"
+            if len(robot.stops) > 1:
+                dest_name += f" (+{len(robot.stops) - 1} stops)"
             
             self.info_labels['ID'].config(text=robot.id)
             self.info_labels['Status'].config(text=robot.status)
@@ -265,11 +301,6 @@ class FleetGUI:
         return screen_x, screen_y
 
     def draw_graph(self):
-        # First create all vertex mappings
-        for i, (x, y, name) in enumerate(self.graph.vertices):
-            screen_x, screen_y = self.transform_coordinates(x, y)
-            self.vertex_map[i] = (screen_x, screen_y)
-
         # Draw lanes first with traffic information
         for start, end in self.graph.lanes:
             x1, y1 = self.vertex_map[start]
@@ -339,15 +370,28 @@ class FleetGUI:
         # Check if clicked on a vertex
         for i, (screen_x, screen_y) in self.vertex_map.items():
             if abs(event.x - screen_x) < 10 and abs(event.y - screen_y) < 10:
-                if self.selected_robot:
+                if self.selected_robot and self.pending_stops:
+                    self.assign_stops(self.selected_robot, self.pending_stops + [i])
+                elif self.selected_robot:
                     self.assign_task(self.selected_robot, i)
                 else:
-                    self.spawn_robot(screen_x, screen_y)
+                    self.spawn_robot(i)
                 break
 
-    def spawn_robot(self, x, y):
-        robot = Robot(x, y)
-        self.robots.append(robot)
+    def handle_shift_click(self, event):
+        """Add the clicked vertex to the stops of the selected robot's next task"""
+        if not self.selected_robot:
+            return
+        for i, (screen_x, screen_y) in self.vertex_map.items():
+            if abs(event.x - screen_x) < 10 and abs(event.y - screen_y) < 10:
+                self.pending_stops.append(i)
+                self.canvas.create_oval(screen_x - 12, screen_y - 12, screen_x + 12, screen_y + 12,
+                                        outline=self.colors['highlight'], dash=(3, 2), width=2,
+                                        tags="pending_stop")
+                break
+
+    def spawn_robot(self, vertex):
+        robot = self.sim.spawn_robot(vertex)
         self.robot_colors[robot.id] = self.get_random_color()
         
         # Draw robot with unique color and status indicator
@@ -383,18 +427,11 @@ class FleetGUI:
                                       tags=f"background_{robot.id}")
             self.canvas.tag_raise(text)
             self.canvas.tag_raise(f"status_dot_{robot.id}")
-        
-        # Log robot spawn
-        current_vertex = self.find_nearest_vertex(x, y)
-        if current_vertex is not None:
-            location = self.graph.vertices[current_vertex][2]
-            robot.set_initial_location(current_vertex)
-            self.logger.log_robot_spawn(robot.id, location)
-        else:
-            self.logger.log_robot_spawn(robot.id, "Unknown Location")
 
     def select_robot(self, robot):
         self.selected_robot = robot
+        self.pending_stops = []
+        self.canvas.delete("pending_stop")
         # Highlight selected robot with a glowing effect
         self.canvas.create_oval(robot.x - 12, robot.y - 12, 
                               robot.x + 12, robot.y + 12, 
@@ -408,72 +445,63 @@ class FleetGUI:
 
     def assign_task(self, robot, destination_vertex):
         """Assign a navigation task to the selected robot"""
-        if robot.status == Robot.STATUS_IDLE:
-            # Calculate path using navigation graph
-            start_vertex = self.find_nearest_vertex(robot.x, robot.y)
-            if start_vertex is not None and destination_vertex is not None:
-                path = self.graph.find_path(start_vertex, destination_vertex)
-                if path:
-                    # Convert path vertices to screen coordinates
-                    screen_path = [self.vertex_map[v] for v in path]
-                    # Assign task with path
-                    robot.assign_task(destination_vertex, screen_path)
-                else:
-                    robot.status = Robot.STATUS_WAITING
-                    robot.wait_time = 30  # Wait for 3 seconds
+        self.sim.assign_task(robot, destination_vertex)
         self.selected_robot = None
         # Remove highlight
         self.canvas.create_oval(robot.x - 10, robot.y - 10, robot.x + 10, robot.y + 10, 
                               outline='black', width=1)
         self.update_robot_info()
 
+    def assign_stops(self, robot, stops):
+        """Send the selected robot through several stops, in whatever order makes the shortest route"""
+        self.sim.assign_stops(robot, stops)
+        self.pending_stops = []
+        self.canvas.delete("pending_stop")
+        self.selected_robot = None
+        self.canvas.create_oval(robot.x - 10, robot.y - 10, robot.x + 10, robot.y + 10,
+                              outline='black', width=1)
+        self.update_robot_info()
+
     def find_nearest_vertex(self, x, y):
         """Find the nearest vertex to given coordinates"""
-        min_dist = float('inf')
-        nearest_vertex = None
-        for i, (vx, vy) in self.vertex_map.items():
-            dist = ((x - vx)**2 + (y - vy)**2)**0.5
-            if dist < min_dist:
-                min_dist = dist
-                nearest_vertex = i
-        return nearest_vertex
+        return self.sim.find_nearest_vertex(x, y)
 
     def update_robot_list(self):
         """Update the robot list in the side panel"""
         self.robot_listbox.delete(0, tk.END)
+        self.listed_robot_ids = []
         for robot in self.robots:
             current_vertex = self.find_nearest_vertex(robot.x, robot.y)
             location = self.graph.vertices[current_vertex][2] if current_vertex is not None else "Unknown"
             self.robot_listbox.insert(tk.END, f"{robot.id} - {location} - {robot.status}")
+            self.listed_robot_ids.append(robot.id)
 
     def on_select_robot_from_list(self, event):
         """Handle robot selection from the list"""
         selection = self.robot_listbox.curselection()
-        if selection:
-            index = selection[0]
-            selected_robot = self.robots[index]
-            self.select_robot(selected_robot)
+        if selection and selection[0] < len(self.listed_robot_ids):
+            selected_robot = self.sim.get_robot(self.listed_robot_ids[selection[0]])
+            if selected_robot is not None:
+                self.select_robot(selected_robot)
 
     def delete_selected_robot(self):
         """Delete the selected robot"""
         if self.selected_robot:
-            # Remove all visual elements of the robot
-            self.canvas.delete(f"robot_{self.selected_robot.id}")
-            self.canvas.delete(f"status_dot_{self.selected_robot.id}")
-            self.canvas.delete(f"status_{self.selected_robot.id}")
-            self.canvas.delete(f"highlight_{self.selected_robot.id}")
-            self.canvas.delete(f"background_{self.selected_robot.id}")
-            self.canvas.delete(f"text_{self.selected_robot.id}")
-            
-            # Remove from lists and dictionaries
-            self.robots.remove(self.selected_robot)
-            del self.robot_colors[self.selected_robot.id]
+            # Remove from the simulation and all visual elements of the robot
+            self.sim.remove_robot(self.selected_robot)
+            self.erase_robot(self.selected_robot.id)
             
             # Clear selection
             self.selected_robot = None
             self.update_robot_info()
             self.update_robot_list()
 
+    def erase_robot(self, robot_id):
+        """Remove a robot's canvas items and color"""
+        for tag in ("robot", "status_dot", "status", "highlight", "background", "text"):
+            self.canvas.delete(f"{tag}_{robot_id}")
+        self.robot_colors.pop(robot_id, None)
+
     def show_notification(self, message, level="info"):
         """Show a notification message"""
         current_time = time.time()
@@ -482,18 +510,6 @@ class FleetGUI:
             
         self.last_notification_time = current_time
         
-        # Create notification window
-        if self.notification_window:
-            self.notification_window.destroy()
-            
-        self.notification_window = tk.Toplevel(self.root)
-        self.notification_window.overrideredirect(True)  # Remove window decorations
-        
-        # Position window at top-right corner
-        x = self.root.winfo_x() + self.root.winfo_width() - 300
-        y = self.root.winfo_y() + 50
-        self.notification_window.geometry(f"300x100+{x}+{y}")
-        
         # Configure colors based on level
         colors = {
             "info": (self.colors['primary'], 'white'),
@@ -502,25 +518,54 @@ class FleetGUI:
         }
         bg_color, fg_color = colors.get(level, colors["info"])
         
-        # Create notification content
-        frame = Frame(self.notification_window, bg=bg_color)
-        frame.pack(fill=tk.BOTH, expand=True)
+        # Create the notification window once and reuse it
+        if self.notification_window is None or not self.notification_window.winfo_exists():
+            self.notification_window = tk.Toplevel(self.root)
+            self.notification_window.overrideredirect(True)  # Remove window decorations
+            frame = Frame(self.notification_window)
+            frame.pack(fill=tk.BOTH, expand=True)
+            self.notification_label = Label(frame, font=("Arial", 10), wraplength=280)
+            self.notification_label.pack(pady=10)
+            self.notification_frame = frame
+        elif self.notification_close_job is not None:
+            self.notification_window.after_cancel(self.notification_close_job)
+        
+        # Position window at top-right corner
+        x = self.root.winfo_x() + self.root.winfo_width() - 300
+        y = self.root.winfo_y() + 50
+        self.notification_window.geometry(f"300x100+{x}+{y}")
+        self.notification_window.deiconify()
         
-        Label(frame, 
-              text=message,
-              font=("Arial", 10),
-              bg=bg_color,
-              fg=fg_color,
-              wraplength=280).pack(pady=10)
+        self.notification_frame.config(bg=bg_color)
+        self.notification_label.config(text=message, bg=bg_color, fg=fg_color)
         
-        # Auto-close after 3 seconds
-        self.notification_window.after(3000, self.notification_window.destroy)
+        # Auto-hide after 3 seconds
+        self.notification_close_job = self.notification_window.after(3000, self.notification_window.withdraw)
+
+    def on_fleet_events(self, events):
+        """Turn a batch of simulation events into a single notification"""
+        rejected = [e.robot_id for e in events if isinstance(e, TaskRejected)]
+        blocked = {e.robot_id: e.reason for e in events
+                   if isinstance(e, StatusChanged) and e.new_status == Robot.STATUS_BLOCKED}
+        completed = [e.robot_id for e in events
+                     if isinstance(e, StatusChanged) and e.new_status == Robot.STATUS_COMPLETE]
+        if rejected:
+            self.show_notification(f"No route from Robot {', '.join(rejected)} to the selected vertex", "error")
+        elif len(blocked) == 1:
+            robot_id, reason = next(iter(blocked.items()))
+            self.show_notification(f"Robot {robot_id} is blocked: {reason}", "warning")
+        elif blocked:
+            self.show_notification(f"Robots {', '.join(blocked)} are blocked", "warning")
+        elif completed:
+            noun = "Robot" if len(completed) == 1 else "Robots"
+            verb = "completed its task" if len(completed) == 1 else "completed their tasks"
+            self.show_notification(f"{noun} {', '.join(completed)} {verb}", "info")
 
     def update_traffic_info(self):
         """Update traffic information display"""
         occupied_lanes = len(self.traffic_manager.get_occupied_lanes())
         waiting_robots = len(self.traffic_manager.get_waiting_robots())
-        blocked_robots = sum(1 for robot in self.robots if robot.status == Robot.STATUS_BLOCKED)
+        blocked_robots = self.robots.count(Robot.STATUS_BLOCKED)
         
         self.traffic_labels['Occupied Lanes'].config(text=str(occupied_lanes))
         self.traffic_labels['Waiting Robots'].config(text=str(waiting_robots))
@@ -528,20 +573,14 @@ class FleetGUI:
 
     def update_robots(self):
         """Update robot positions and statuses"""
+        # Advance the simulation core by one tick
+        self.sim.step()
+        for robot in self.sim.reclaimed:
+            self.erase_robot(robot.id)
+            if self.selected_robot is robot:
+                self.selected_robot = None
+
         for robot in self.robots:
-            # Store previous position for movement detection
-            prev_x, prev_y = robot.x, robot.y
-            
-            # Update robot state with traffic manager
-            robot.update(self.traffic_manager)
-            
-            # Check for status changes and show notifications
-            if robot.has_status_changed():
-                if robot.status == Robot.STATUS_BLOCKED:
-                    self.show_notification(f"Robot {robot.id} is blocked: {robot.blocked_reason}", "warning")
-                elif robot.status == Robot.STATUS_COMPLETE:
-                    self.show_notification(f"Robot {robot.id} completed its task", "info")
-            
             # Update robot visualization
             self.canvas.delete(f"robot_{robot.id}")
             self.canvas.delete(f"status_dot_{robot.id}")
@@ -599,5 +638,41 @@ class FleetGUI:
         self.update_robot_info()
         self.update_robot_list()
 
+        # Periodically hand a copy of the fleet state to the snapshot writer
+        if self.snapshot_writer.is_due():
+            self.event_log.flush()
+            self.snapshot_writer.submit(self.capture_snapshot())
+
         # Schedule next update
         self.root.after(100, self.update_robots)
+
+    def capture_snapshot(self):
+        """Capture the current fleet state"""
+        return self.sim.capture_snapshot()
+
+    def restore_latest_snapshot(self):
+        """Restore robots and traffic state from the last snapshot, if it fits this graph"""
+        try:
+            snapshot = self.snapshot_writer.load_latest()
+        except ValueError as e:
+            print(f"Ignoring unusable snapshot: {e}")
+            return False
+        if snapshot is None or not snapshot.matches_graph(self.graph):
+            return False
+        self.sim.restore_snapshot(snapshot)
+        # Seed this session's snapshot history so replays can start from the restored state
+        self.snapshot_writer.submit(self.capture_snapshot())
+        self.robot_colors = {robot.id: self.get_random_color() for robot in self.robots}
+        self.selected_robot = None
+        self.update_robot_list()
+        return True
+
+    def on_close(self):
+        """Write a final snapshot and close the window"""
+        self.snapshot_writer.submit(self.capture_snapshot())
+        self.snapshot_writer.stop()
+        self.sim.events.flush(self.sim.tick, force=True)  # Deliver batches still waiting on their cadence
+        self.event_log.close()
+        self.telemetry.close()
+        self.logger.log_system_end()
+        self.root.destroy()
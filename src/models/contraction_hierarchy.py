@@ -0,0 +1,217 @@
+import heapq
+import os
+import pickle
+from typing import Dict, List, Optional, Tuple
+
+HIERARCHY_SUFFIX = ".ch"  # Written next to the graph file
+HIERARCHY_VERSION = 1
+WITNESS_SETTLE_LIMIT = 200  # Nodes a witness search may settle before assuming no witness
+
+
+class ContractionHierarchy:
+    """Contraction hierarchy over a NavGraph's lanes, weighted by lane length.
+
+    Vertices are contracted one at a time (cheapest first by edge difference),
+    adding shortcut edges where the contracted vertex was on the only short path.
+    A query is a bidirectional Dijkstra that only climbs to higher-ranked vertices,
+    and skips vertices that a higher vertex already reaches more cheaply (stall-on-demand),
+    so it settles a small fraction of the graph. Shortcuts are unpacked back
+    into real lanes at the end.
+    """
+
+    def __init__(self, rank, forward_up, backward_up, middle, signature):
+        self.rank: List[int] = rank
+        self.forward_up: List[List[Tuple[int, float]]] = forward_up  # u -> [(v, w)] with rank[v] > rank[u]
+        self.backward_up: List[List[Tuple[int, float]]] = backward_up  # v -> [(u, w)] for u->v with rank[u] > rank[v]
+        self.middle: Dict[Tuple[int, int], int] = middle  # shortcut (u, w) -> contracted vertex between them
+        self.signature = signature
+
+    @classmethod
+    def build(cls, graph):
+        """Contract every vertex of the graph"""
+        n = len(graph.vertices)
+        out_edges: List[Dict[int, float]] = [{} for _ in range(n)]
+        in_edges: List[Dict[int, float]] = [{} for _ in range(n)]
+        for u, neighbors in graph.adjacency_list.items():
+            for v in neighbors:
+                if u != v:
+                    w = graph.lane_length(u, v)
+                    if w < out_edges[u].get(v, float('inf')):
+                        out_edges[u][v] = w
+                        in_edges[v][u] = w
+        middle: Dict[Tuple[int, int], int] = {}
+        contracted = [False] * n
+        contracted_neighbors = [0] * n
+        level = [0] * n  # Depth in the hierarchy, keeps contraction spread evenly over the graph
+        rank = [0] * n
+
+        def shortcuts_for(v):
+            """Shortcuts needed if v were contracted now"""
+            needed = []
+            targets = {w: wt for w, wt in out_edges[v].items() if not contracted[w]}
+            if not targets:
+                return needed
+            max_out = max(targets.values())
+            for u, w_uv in in_edges[v].items():
+                if contracted[u]:
+                    continue
+                limit = w_uv + max_out
+                dist = cls._witness_search(out_edges, contracted, u, v, limit)
+                for w, w_vw in targets.items():
+                    if w == u:
+                        continue
+                    via = w_uv + w_vw
+                    if dist.get(w, float('inf')) > via:
+                        needed.append((u, w, via))
+            return needed
+
+        def priority(v):
+            degree = sum(1 for u in in_edges[v] if not contracted[u]) + \
+                sum(1 for w in out_edges[v] if not contracted[w])
+            return 2 * (len(shortcuts_for(v)) - degree) + contracted_neighbors[v] + level[v]
+
+        heap = [(priority(v), v) for v in range(n)]
+        heapq.heapify(heap)
+        order = 0
+        while heap:
+            _, v = heapq.heappop(heap)
+            if contracted[v]:
+                continue
+            # Lazy update: re-evaluate and defer if no longer the cheapest
+            current = priority(v)
+            if heap and current > heap[0][0]:
+                heapq.heappush(heap, (current, v))
+                continue
+            for u, w, via in shortcuts_for(v):
+                if via < out_edges[u].get(w, float('inf')):
+                    out_edges[u][w] = via
+                    in_edges[w][u] = via
+                    middle[(u, w)] = v
+            contracted[v] = True
+            rank[v] = order
+            order += 1
+            for neighbor in set(in_edges[v]) | set(out_edges[v]):
+                contracted_neighbors[neighbor] += 1
+                level[neighbor] = max(level[neighbor], level[v] + 1)
+
+        forward_up = [[] for _ in range(n)]
+        backward_up = [[] for _ in range(n)]
+        for u in range(n):
+            for v, w in out_edges[u].items():
+                if rank[v] > rank[u]:
+                    forward_up[u].append((v, w))
+                else:
+                    backward_up[v].append((u, w))
+        return cls(rank, forward_up, backward_up, middle, graph.signature())
+
+    @staticmethod
+    def _witness_search(out_edges, contracted, source, excluded, limit):
+        """Bounded Dijkstra from source that avoids the vertex being contracted"""
+        dist = {source: 0.0}
+        heap = [(0.0, source)]
+        settled = 0
+        while heap and settled < WITNESS_SETTLE_LIMIT:
+            d, u = heapq.heappop(heap)
+            if d > dist.get(u, float('inf')):
+                continue
+            if d > limit:
+                break
+            settled += 1
+            for v, w in out_edges[u].items():
+                if v == excluded or contracted[v]:
+                    continue
+                nd = d + w
+                if nd < dist.get(v, float('inf')):
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        return dist
+
+    def query(self, source, target) -> Optional[List[int]]:
+        """Shortest path as a list of vertices, or None if unreachable"""
+        if source == target:
+            return [source]
+        dist = ({source: 0.0}, {target: 0.0})
+        parent = ({source: None}, {target: None})
+        heaps = ([(0.0, source)], [(0.0, target)])
+        edges = (self.forward_up, self.backward_up)
+        best = float('inf')
+        meeting = None
+        side = 0
+        while True:
+            # A direction is finished once it cannot improve on the best meeting point
+            done = (not heaps[0] or heaps[0][0][0] >= best, not heaps[1] or heaps[1][0][0] >= best)
+            if done[0] and done[1]:
+                break
+            if done[side]:
+                side = 1 - side
+            d, u = heapq.heappop(heaps[side])
+            if d > dist[side].get(u, float('inf')):
+                side = 1 - side
+                continue
+            other = dist[1 - side].get(u)
+            if other is not None and d + other < best:
+                best = d + other
+                meeting = u
+            # Stall-on-demand: a higher vertex already reaches u more cheaply, so u is not on a shortest up-path
+            if any(dist[side].get(v, float('inf')) + w < d for v, w in edges[1 - side][u]):
+                side = 1 - side
+                continue
+            for v, w in edges[side][u]:
+                nd = d + w
+                if nd < dist[side].get(v, float('inf')):
+                    dist[side][v] = nd
+                    parent[side][v] = u
+                    heapq.heappush(heaps[side], (nd, v))
+            side = 1 - side
+        if meeting is None:
+            return None
+
+        # Stitch the two halves together, then expand shortcuts
+        up_path = []
+        node = meeting
+        while node is not None:
+            up_path.append(node)
+            node = parent[0][node]
+        up_path.reverse()
+        node = parent[1][meeting]
+        while node is not None:
+            up_path.append(node)
+            node = parent[1][node]
+        return self._unpack(up_path)
+
+    def _unpack(self, path):
+        result = [path[0]]
+        for u, v in zip(path, path[1:]):
+            stack = [(u, v)]
+            while stack:
+                a, b = stack.pop()
+                mid = self.middle.get((a, b))
+                if mid is None:
+                    result.append(b)
+                else:
+                    # Expand a -> mid first, so push it last
+                    stack.append((mid, b))
+                    stack.append((a, mid))
+        return result
+
+    def save(self, file_path):
+        """Write the hierarchy to disk"""
+        with open(file_path, 'wb') as file:
+            pickle.dump((HIERARCHY_VERSION, self.signature, self.rank, self.forward_up,
+                         self.backward_up, self.middle), file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, file_path):
+        """Read a hierarchy written by save(), or None if there is none"""
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path, 'rb') as file:
+            version, signature, rank, forward_up, backward_up, middle = pickle.load(file)
+        if version != HIERARCHY_VERSION:
+            return None
+        return cls(rank, forward_up, backward_up, middle, signature)
+
+
+def hierarchy_path(graph_path):
+    """Sidecar path for a graph file's hierarchy"""
+    return os.path.splitext(graph_path)[0] + HIERARCHY_SUFFIX
@@ -0,0 +1,65 @@
+from typing import Dict, Iterator, List, Optional, Set
+
+from src.models.robot import Robot
+
+
+class FleetRegistry:
+    """The fleet keyed by robot ID, with an index of robot IDs per status.
+
+    Robots iterate in spawn order. Adding, removing, looking up and counting by
+    status are all O(1); the owner reports status changes with status_changed()
+    so the index stays in step with the robots.
+    """
+
+    def __init__(self, robots=()):
+        self._robots: Dict[str, Robot] = {}
+        self._by_status: Dict[str, Set[str]] = {}
+        for robot in robots:
+            self.add(robot)
+
+    def __iter__(self) -> Iterator[Robot]:
+        return iter(self._robots.values())
+
+    def __len__(self):
+        return len(self._robots)
+
+    def __contains__(self, robot_id):
+        return robot_id in self._robots
+
+    def add(self, robot: Robot):
+        """Register a robot"""
+        if robot.id in self._robots:
+            print(f"Error: Robot {robot.id} is already registered")
+            raise ValueError(f"Duplicate robot ID {robot.id}")
+        self._robots[robot.id] = robot
+        self._by_status.setdefault(robot.status, set()).add(robot.id)
+
+    def remove(self, robot: Robot):
+        """Unregister a robot"""
+        del self._robots[robot.id]
+        self._by_status[robot.status].discard(robot.id)
+
+    def get(self, robot_id) -> Optional[Robot]:
+        """Find a robot by ID"""
+        return self._robots.get(robot_id)
+
+    def status_changed(self, robot: Robot, old_status):
+        """Move a robot between status sets after its status changed from old_status"""
+        self._by_status[old_status].discard(robot.id)
+        self._by_status.setdefault(robot.status, set()).add(robot.id)
+
+    def ids_with_status(self, status) -> Set[str]:
+        """IDs of the robots currently in a status (a live view, do not modify)"""
+        return self._by_status.get(status, set())
+
+    def with_status(self, status) -> List[Robot]:
+        """Robots currently in a status"""
+        return [self._robots[robot_id] for robot_id in self.ids_with_status(status)]
+
+    def count(self, status) -> int:
+        """Number of robots in a status"""
+        return len(self._by_status.get(status, ()))
+
+    def status_counts(self) -> Dict[str, int]:
+        """Number of robots in each status that has any"""
+        return {status: len(ids) for status, ids in self._by_status.items() if ids}
@@ -0,0 +1,415 @@
+from typing import Dict, List, Optional, Tuple
+
+from src.models.fleet_registry import FleetRegistry
+from src.models.robot import Robot
+from src.models.stop_sequencer import StopSequencer
+from src.models.traffic_manager import TrafficManager
+from src.models.travel_time import TravelTimeModel
+from src.utils.event_bus import (EventBus, RobotRemoved, RobotSpawned, StatusChanged, TaskAssigned,
+                                 TaskCompleted, TaskRejected, TrafficWait)
+from src.utils.snapshot import FleetSnapshot
+
+
+TICK_SECONDS = 0.1  # Simulated time per tick, matching the GUI's 100 ms update
+CONGESTION_REFRESH_TICKS = 50  # How often observed traffic delays are fed into travel_times
+DEADLOCK_CHECK_TICKS = 5  # How often robots blocking each other in a cycle are made to give way
+PARKED_PATIENCE_TICKS = 20  # How long a robot waits on a parked robot before going round it
+GIVE_WAY_COOLDOWN_TICKS = 100  # A robot that gave way this recently is asked last, so robots take turns
+
+
+class FleetSimulation:
+    """Headless simulation core: the robot fleet, traffic management and the tick loop.
+
+    Robot positions live in the coordinate frame of vertex_map (screen pixels when
+    driven by the GUI, raw graph coordinates by default). Every command and traffic
+    decision is recorded to the optional event log so a run can be replayed.
+    With idle_ttl set, robots that finished a task and then sat idle for that
+    many ticks are reclaimed (removed) automatically.
+
+    Consumers (GUI, logging, analytics) subscribe to typed events on `events`;
+    they are delivered in per-tick batches at the end of step(). travel_times
+    estimates ETAs in ticks and is refreshed with observed congestion as the fleet runs.
+    """
+
+    def __init__(self, graph, vertex_map=None, event_log=None, min_headway=30.0, idle_ttl=None,
+                 traffic_manager: Optional[TrafficManager] = None, telemetry=None):
+        self.graph = graph
+        if vertex_map is None:
+            vertex_map = {i: (x, y) for i, (x, y, name) in enumerate(graph.vertices)}
+        self.vertex_map: Dict[int, Tuple[float, float]] = vertex_map
+        self.event_log = event_log
+        self.telemetry = telemetry  # Optional TelemetryRecorder sampled at the end of every tick
+        self.events = EventBus()
+        self.robots = FleetRegistry()
+        self.idle_ttl: Optional[int] = idle_ttl
+        self.reclaimed: List[Robot] = []  # Robots reclaimed by the last step()
+        self.gave_way_at: Dict[str, int] = {}  # robot_id -> tick it last gave way
+        self.tick = 0
+        self.traffic_manager = traffic_manager or TrafficManager(min_headway)
+        self.frame_lane_lengths = self.lane_lengths()
+        self.traffic_manager.set_lane_lengths(self.frame_lane_lengths)
+        self.traffic_manager.listener = self._on_traffic_event
+        self.travel_times = TravelTimeModel(graph, self.frame_lane_lengths, Robot.DEFAULT_SPEED,
+                                            limit_scale=self.frame_scale() * TICK_SECONDS)
+        self.sequencer = StopSequencer(self.travel_times.eta)  # Orders the stops of multi-stop tasks
+        self._record("start", robot_count=Robot.robot_count, idle_ttl=idle_ttl,
+                     vertex_map=[list(self.vertex_map[i]) for i in range(len(self.vertex_map))])
+
+    def lane_lengths(self) -> Dict[Tuple[int, int], float]:
+        """Length of every lane in the vertex_map frame"""
+        lengths = {}
+        for start, end in self.graph.lanes:
+            (x1, y1), (x2, y2) = self.vertex_map[start], self.vertex_map[end]
+            lengths[(start, end)] = ((x2 - x1)**2 + (y2 - y1)**2)**0.5
+        return lengths
+
+    def frame_scale(self) -> float:
+        """vertex_map units per graph unit"""
+        for start, end in self.graph.lanes:
+            graph_length = self.graph.lane_length(start, end)
+            if graph_length > 0:
+                return self.frame_lane_lengths[(start, end)] / graph_length
+        return 1.0
+
+    def eta(self, robot) -> float:
+        """Estimated ticks until a robot reaches its destination along its planned path"""
+        if not robot.path or robot.destination_vertex is None:
+            return 0.0
+        next_x, next_y = robot.path[0]
+        to_next_point = ((next_x - robot.x)**2 + (next_y - robot.y)**2)**0.5 / robot.speed
+        remaining = robot.vertex_path[len(robot.vertex_path) - len(robot.path):]
+        return to_next_point + self.travel_times.route_time(remaining)
+
+    def _record(self, event_type, **data):
+        """Append an event stamped with the current tick"""
+        if self.event_log is not None:
+            self.event_log.record(self.tick, event_type, **data)
+
+    def _on_traffic_event(self, event_type, robot_id, resource):
+        """Record lane/vertex grants and releases reported by the traffic manager"""
+        if event_type == "wait":
+            self.events.publish(TrafficWait(self.tick, robot_id, resource))
+            return
+        self._record(event_type, robot=robot_id, resource=resource)
+
+    def get_robot(self, robot_id) -> Optional[Robot]:
+        """Find a robot by ID"""
+        return self.robots.get(robot_id)
+
+    def find_nearest_vertex(self, x, y):
+        """Find the nearest vertex to given coordinates"""
+        min_dist = float('inf')
+        nearest_vertex = None
+        for i, (vx, vy) in self.vertex_map.items():
+            dist = ((x - vx)**2 + (y - vy)**2)**0.5
+            if dist < min_dist:
+                min_dist = dist
+                nearest_vertex = i
+        return nearest_vertex
+
+    def spawn_robot(self, vertex, robot_id=None) -> Robot:
+        """Spawn a robot on a vertex"""
+        x, y = self.vertex_map[vertex]
+        robot = Robot(x, y)
+        if robot_id is not None:
+            robot.id = robot_id  # Replays reuse the recorded ID
+        robot.set_initial_location(vertex)
+        if not self.traffic_manager.request_vertex(robot.id, vertex):
+            self.traffic_manager.withdraw(robot.id)  # Spot taken, it will queue for it when given a task
+        self.robots.add(robot)
+        self._record("spawn", robot=robot.id, vertex=vertex)
+        self.events.publish(RobotSpawned(self.tick, robot.id, vertex))
+        return robot
+
+    def assign_task(self, robot, destination_vertex) -> bool:
+        """Plan a path and assign a navigation task. Returns False if the robot could not be routed."""
+        self._record("task", robot=robot.id, destination=destination_vertex)
+        if robot.status != Robot.STATUS_IDLE:
+            return False
+        start_vertex = self.find_nearest_vertex(robot.x, robot.y)
+        if start_vertex is None or destination_vertex is None:
+            return False
+        if not self.graph.is_reachable(start_vertex, destination_vertex):
+            # No route exists, reject instead of parking the robot to retry
+            self.events.publish(TaskRejected(self.tick, robot.id, destination_vertex))
+            return False
+        path = self.graph.find_path(start_vertex, destination_vertex)
+        if path:
+            # Convert path vertices to coordinates
+            coordinate_path = [self.vertex_map[v] for v in path]
+            robot.assign_task(destination_vertex, coordinate_path, path)
+            self.robots.status_changed(robot, Robot.STATUS_IDLE)
+            self.events.publish(TaskAssigned(self.tick, robot.id, destination_vertex))
+            return True
+        self._set_status(robot, Robot.STATUS_WAITING)
+        robot.wait_time = 30  # Wait for 3 seconds
+        return False
+
+    def assign_stops(self, robot, stops, ordered=False) -> bool:
+        """Plan one route through several stops and assign it as a single task.
+
+        Unordered stops are first sequenced for the shortest route from the
+        robot's vertex; the event log records the resulting visit order, so a
+        replay does not depend on the sequencer's time budget. Returns False if
+        the robot could not be routed.
+        """
+        stops = list(stops)
+        start_vertex = self.find_nearest_vertex(robot.x, robot.y)
+        if robot.status == Robot.STATUS_IDLE and start_vertex is not None and not ordered:
+            stops = self.sequencer.sequence(start_vertex, stops)
+        self._record("stops", robot=robot.id, stops=stops)
+        if robot.status != Robot.STATUS_IDLE or start_vertex is None or not stops:
+            return False
+        path = [start_vertex]
+        for stop in stops:
+            if stop is None or not self.graph.is_reachable(path[-1], stop):
+                self.events.publish(TaskRejected(self.tick, robot.id, stop))
+                return False
+            leg = self.graph.find_path(path[-1], stop)
+            if not leg:
+                self._set_status(robot, Robot.STATUS_WAITING)
+                robot.wait_time = 30
+                return False
+            path.extend(leg[1:])
+        robot.assign_task(stops[-1], [self.vertex_map[v] for v in path], path, stops)
+        self.robots.status_changed(robot, Robot.STATUS_IDLE)
+        self.events.publish(TaskAssigned(self.tick, robot.id, stops[-1]))
+        return True
+
+    def _set_status(self, robot, status):
+        """Change a robot's status outside of its own update, keeping the registry in step"""
+        old_status = robot.status
+        robot.status = status
+        self.robots.status_changed(robot, old_status)
+
+    def remove_robot(self, robot):
+        """Remove a robot and free everything it holds"""
+        self._record("remove", robot=robot.id)
+        self.traffic_manager.release_all(robot.id)
+        self.robots.remove(robot)
+        self.gave_way_at.pop(robot.id, None)
+        self.events.publish(RobotRemoved(self.tick, robot.id, "removed"))
+
+    def detach_robot(self, robot):
+        """Take a robot out of this simulation without releasing what it holds, to hand it over elsewhere"""
+        self.robots.remove(robot)
+
+    def attach_robot(self, robot):
+        """Take in a robot handed over by another simulation"""
+        self.robots.add(robot)
+
+    def step(self) -> List[Tuple[Robot, str]]:
+        """Advance every robot by one tick. Returns (robot, old_status) for status changes."""
+        changes = []
+        for robot in self.robots:
+            old_status = robot.status
+            robot.update(self.traffic_manager)
+            if robot.status != old_status:
+                changes.append((robot, old_status))
+                self.robots.status_changed(robot, old_status)
+                if robot.status == Robot.STATUS_IDLE:
+                    robot.idle_since = self.tick
+                self._record("status", robot=robot.id, old=old_status, new=robot.status,
+                             reason=robot.blocked_reason)
+                self.events.publish(StatusChanged(self.tick, robot.id, old_status, robot.status,
+                                                  robot.blocked_reason))
+                if robot.status == Robot.STATUS_COMPLETE:
+                    self.events.publish(TaskCompleted(self.tick, robot.id, robot.source_vertex,
+                                                      robot.destination_vertex, robot.get_path_length()))
+        if self.tick % DEADLOCK_CHECK_TICKS == 0:
+            self.resolve_deadlocks()
+        self.reclaimed = self.reclaim_idle() if self.idle_ttl is not None else []
+        if self.telemetry is not None:
+            self.telemetry.record(self.tick, self.robots)
+        if self.tick % CONGESTION_REFRESH_TICKS == 0:
+            self.travel_times.refresh_congestion(self.traffic_manager)
+        self.events.flush(self.tick)
+        self.tick += 1
+        return changes
+
+    def resolve_deadlocks(self) -> List[Robot]:
+        """Break every cycle of robots waiting on each other by making one of them give way.
+
+        Robots waiting at a vertex are asked first, as they only have to take
+        another lane; a robot waiting on a lane has to turn back. Robots that
+        gave way in the last GIVE_WAY_COOLDOWN_TICKS are asked last. If none
+        can, a robot blocking another way out of the cycle gives way. Robots kept
+        waiting by a parked robot go round it once they have waited
+        PARKED_PATIENCE_TICKS, or if it is parked on their stop, it moves aside.
+        Returns the robots that gave way.
+        """
+        gave_way: List[Robot] = []
+        for cycle in self.traffic_manager.find_wait_cycles():
+            robots = [self.robots.get(robot_id) for robot_id in cycle]
+            if any(robot in gave_way for robot in robots):
+                continue  # Already broken by a robot it shares with another cycle
+            robots = sorted((robot for robot in robots if robot is not None),
+                            key=lambda robot: (self.tick - self.gave_way_at.get(robot.id, -GIVE_WAY_COOLDOWN_TICKS)
+                                               < GIVE_WAY_COOLDOWN_TICKS, robot.current_lane is not None, robot.id))
+            for robot in robots:
+                if self.give_way(robot):
+                    gave_way.append(robot)
+                    break
+            else:
+                # Nobody in the cycle has a way out: clear one for a robot at a vertex
+                robot = self._clear_way_out(robots)
+                if robot is not None:
+                    gave_way.append(robot)
+        for robot_id in sorted(self.robots.ids_with_status(Robot.STATUS_BLOCKED)):
+            if self.traffic_manager.wait_ticks.get(robot_id, 0) < PARKED_PATIENCE_TICKS:
+                continue
+            blockers = [self.robots.get(blocker) for blocker in self.traffic_manager.waits_for(robot_id)]
+            if blockers and all(blocker is not None and blocker.status == Robot.STATUS_IDLE for blocker in blockers):
+                robot = self.robots.get(robot_id)
+                if self.give_way(robot, avoid_vertex=blockers[0].current_vertex):
+                    gave_way.append(robot)
+                elif self._move_aside(blockers[0]):
+                    gave_way.append(blockers[0])  # Parked on the robot's stop, so it has to make room
+        return gave_way
+
+    def give_way(self, robot, avoid_vertex=None) -> bool:
+        """Send a blocked robot another way to its next stop, if given around avoid_vertex.
+        Returns False if it has no other way."""
+        if robot.status != Robot.STATUS_BLOCKED or not robot.path:
+            return False
+        stop = robot.stops[0] if robot.stops else robot.destination_vertex
+        remaining = robot.vertex_path[len(robot.vertex_path) - len(robot.path):]
+        tail = remaining[remaining.index(stop) + 1:] if stop in remaining else []
+        lane = robot.current_lane
+        avoid_lanes = set()
+        if avoid_vertex is not None:
+            if avoid_vertex == stop:
+                return False  # Nothing to go round, the parked robot is on the stop itself
+            avoid_lanes = {(neighbor, avoid_vertex) for neighbor in self.graph.adjacency_list[avoid_vertex]}
+        if lane is None:
+            # Waiting at a vertex to enter a lane: leave by any other lane that is free
+            start = robot.current_vertex
+            if start is None or robot.waiting_for_lane is None:
+                return False
+            route = self._detour(robot.id, start, stop, avoid_lanes | {robot.waiting_for_lane})
+            if route is None:
+                return False
+            came_from = []
+        else:
+            # Waiting at the end of a lane: drive back to where it entered and go round
+            start = lane[0]
+            route = (self.graph.find_shortest_path(start, stop, avoid_lanes=avoid_lanes | {lane})
+                     or self.graph.find_shortest_path(start, stop, avoid_lanes=avoid_lanes))
+            if route is None or not self.traffic_manager.turn_back(robot.id, lane):
+                return False
+            robot.current_lane = (lane[1], lane[0])
+            robot.current_vertex = lane[1]  # Drive the reversed lane as if arriving from its far end
+            robot.lane_entry_distance = ((self.vertex_map[start][0] - robot.x)**2 +
+                                         (self.vertex_map[start][1] - robot.y)**2)**0.5
+            came_from = [lane[1]]
+        vertex_path = route + tail
+        robot.vertex_path = came_from + vertex_path
+        # A robot at a vertex is already at the route's first point, a turned-back one still has to reach it
+        robot.path = [self.vertex_map[v] for v in (vertex_path if came_from else vertex_path[1:])]
+        robot.waiting_for_lane = None
+        robot.waiting_for_vertex = None
+        robot.blocked_reason = None
+        self.traffic_manager.withdraw(robot.id)
+        self.gave_way_at[robot.id] = self.tick
+        self._set_status(robot, Robot.STATUS_MOVING)
+        self._record("give_way", robot=robot.id, route=vertex_path)
+        self.events.publish(StatusChanged(self.tick, robot.id, Robot.STATUS_BLOCKED, Robot.STATUS_MOVING,
+                                          "gave way"))
+        return True
+
+    def _move_aside(self, robot) -> bool:
+        """Send a parked robot to a free neighboring vertex. Returns False if there is none."""
+        start = robot.current_vertex
+        if robot.status != Robot.STATUS_IDLE or start is None:
+            return False
+        for neighbor in sorted(self.graph.adjacency_list[start]):
+            side_lane = (start, neighbor)
+            if side_lane in self.graph.closed_lanes or not self.traffic_manager.can_acquire(
+                    side_lane, neighbor, robot_id=robot.id):
+                continue
+            robot.assign_task(neighbor, [self.vertex_map[neighbor]], [start, neighbor])
+            self.robots.status_changed(robot, Robot.STATUS_IDLE)
+            self._record("move_aside", robot=robot.id, vertex=neighbor)
+            self.events.publish(StatusChanged(self.tick, robot.id, Robot.STATUS_IDLE, Robot.STATUS_MOVING,
+                                              "moved aside"))
+            return True
+        return False
+
+    def _clear_way_out(self, robots) -> Optional[Robot]:
+        """Make a robot blocking another exit of a deadlocked robot at a vertex give way. Returns it."""
+        for robot in robots:
+            if robot.current_lane is not None or robot.current_vertex is None:
+                continue
+            for neighbor in sorted(self.graph.adjacency_list[robot.current_vertex]):
+                exit_lane = (robot.current_vertex, neighbor)
+                if exit_lane == robot.waiting_for_lane or exit_lane in self.graph.closed_lanes:
+                    continue
+                for blocker_id in self.traffic_manager.blockers(robot.id, exit_lane):
+                    blocker = self.robots.get(blocker_id)
+                    if blocker is not None and blocker not in robots and self.give_way(blocker):
+                        return blocker
+        return None
+
+    def _detour(self, robot_id, start, stop, avoid_lanes) -> Optional[List[int]]:
+        """Route from start to stop clear of avoid_lanes whose first lane is free, or failing that
+        a step aside to a free neighbor first"""
+        route = self.graph.find_shortest_path(start, stop, avoid_lanes=avoid_lanes)
+        if route is not None and len(route) > 1 and self.traffic_manager.can_acquire((start, route[1]),
+                                                                                       robot_id=robot_id):
+            return route
+        for neighbor in sorted(self.graph.adjacency_list[start]):
+            side_lane = (start, neighbor)
+            if (side_lane in avoid_lanes or side_lane in self.graph.closed_lanes
+                    or not self.traffic_manager.can_acquire(side_lane, robot_id=robot_id)):
+                continue
+            # Coming back through start is fine once the way ahead has cleared
+            onward = self.graph.find_shortest_path(
+                neighbor, stop, avoid_lanes={other for other in avoid_lanes if other[0] != start})
+            if onward is not None:
+                return [start] + onward
+        return None
+
+    def reclaim_idle(self) -> List[Robot]:
+        """Remove robots that finished a task and have been idle for idle_ttl ticks"""
+        expired = [robot for robot in self.robots.with_status(Robot.STATUS_IDLE)
+                   if robot.should_be_removed() and robot.idle_since is not None
+                   and self.tick - robot.idle_since >= self.idle_ttl]
+        expired.sort(key=lambda robot: (robot.idle_since, robot.id))  # Deterministic order for replays
+        for robot in expired:
+            self._record("reclaim", robot=robot.id)
+            self.traffic_manager.release_all(robot.id)
+            self.robots.remove(robot)
+            self.events.publish(RobotRemoved(self.tick, robot.id, "reclaimed"))
+        return expired
+
+    def apply_event(self, event):
+        """Re-issue a recorded command event (spawn, task, stops or remove)"""
+        event_type = event["type"]
+        if event_type == "spawn":
+            self.spawn_robot(event["vertex"], robot_id=event["robot"])
+        elif event_type == "task":
+            robot = self.get_robot(event["robot"])
+            if robot is not None:
+                self.assign_task(robot, event["destination"])
+        elif event_type == "stops":
+            robot = self.get_robot(event["robot"])
+            if robot is not None:
+                self.assign_stops(robot, event["stops"], ordered=True)
+        elif event_type == "remove":
+            robot = self.get_robot(event["robot"])
+            if robot is not None:
+                self.remove_robot(robot)
+
+    def capture_snapshot(self) -> FleetSnapshot:
+        """Capture the current fleet state"""
+        return FleetSnapshot.capture(self.robots, self.traffic_manager, self.graph, self.tick, self.gave_way_at)
+
+    def restore_snapshot(self, snapshot: FleetSnapshot):
+        """Replace the fleet with the contents of a snapshot"""
+        self.traffic_manager.listener = None  # Loading a snapshot is not a stream of grants
+        robots, self.traffic_manager = snapshot.restore(self.traffic_manager)
+        self.robots = FleetRegistry(robots)
+        self.traffic_manager.listener = self._on_traffic_event
+        self.tick = snapshot.tick
+        self.gave_way_at = dict(snapshot.gave_way_at)  # Picks who gives way next, so replays must match
+        self._record("restore", snapshot_tick=snapshot.tick, robot_count=snapshot.robot_count)
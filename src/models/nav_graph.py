@@ -1,22 +1,47 @@
+import hashlib
+import heapq
 import json
+import os
+import pickle
 from collections import deque
 
+from src.models.contraction_hierarchy import ContractionHierarchy, hierarchy_path
+from src.models.reachability import ReachabilityIndex
+
+COMPILED_SUFFIX = ".navc"  # Pre-parsed graph written by the compile-graph command
+COMPILED_VERSION = 2
+
 class NavGraph:
     def __init__(self, file_path):
         self.vertices = []
         self.lanes = []
+        self.speed_limits = {}  # (start, end) -> speed_limit, for lanes that set one
         self.adjacency_list = {}  # For efficient path finding
+        self.closed_lanes = set()  # (start, end) lanes that must not be traversed
+        self.hierarchy = None  # Optional ContractionHierarchy for fast shortest-path queries
+        self.isolated_vertices = []  # Vertices no lane touches, reported at load
+        self.file_path = file_path
+        self._signature = None  # Vertices and lanes never change once loaded, so hash them once
         self.load_graph(file_path)
+        self.validate()
         self.build_adjacency_list()
+        self.reachability = ReachabilityIndex(self)  # O(1) "is there any route" checks
+        self.load_hierarchy()
 
     def load_graph(self, file_path):
-        """Load graph data from JSON file"""
+        """Load graph data from JSON file, or from a compiled graph file"""
+        if file_path.endswith(COMPILED_SUFFIX):
+            self.load_compiled(file_path)
+            return
         try:
             with open(file_path, 'r') as file:
                 data = json.load(file)
                 level = data["levels"]["level1"]
                 self.vertices = [(v[0], v[1], v[2].get("name", "")) for v in level["vertices"]]
                 self.lanes = [(l[0], l[1]) for l in level["lanes"]]
+                # A speed_limit of 0 (or none) means the lane is unrestricted
+                self.speed_limits = {(l[0], l[1]): float(l[2]["speed_limit"]) for l in level["lanes"]
+                                     if len(l) > 2 and l[2].get("speed_limit")}
         except FileNotFoundError:
             print(f"Error: Could not find navigation graph file at {file_path}")
             raise
@@ -27,6 +52,45 @@ class NavGraph:
             print(f"Error loading graph file: {e}")
             raise
 
+    def load_compiled(self, file_path):
+        """Load vertices and lanes from a file written by save_compiled()"""
+        with open(file_path, 'rb') as file:
+            data = pickle.load(file)
+        version = data[0]
+        if version == 1:
+            _, self.vertices, self.lanes = data  # Written before speed limits were kept
+        elif version == COMPILED_VERSION:
+            _, self.vertices, self.lanes, self.speed_limits = data
+        else:
+            raise ValueError(f"Unsupported compiled graph version: {version}")
+
+    def save_compiled(self, output_path):
+        """Write the parsed graph in a binary form that loads without JSON parsing"""
+        if not output_path.endswith(COMPILED_SUFFIX):
+            output_path = os.path.splitext(output_path)[0] + COMPILED_SUFFIX
+        with open(output_path, 'wb') as file:
+            pickle.dump((COMPILED_VERSION, self.vertices, self.lanes, self.speed_limits), file,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        return output_path
+
+    def validate(self):
+        """Check lanes against the vertex list. Dangling lane endpoints are an error,
+        isolated vertices only a warning."""
+        vertex_count = len(self.vertices)
+        dangling = [(start, end) for start, end in self.lanes
+                    if not (0 <= start < vertex_count and 0 <= end < vertex_count)]
+        if dangling:
+            print(f"Error: Invalid graph file. Lanes reference missing vertices: {dangling}")
+            raise ValueError(f"Lanes reference missing vertices: {dangling}")
+        connected = set()
+        for start, end in self.lanes:
+            connected.add(start)
+            connected.add(end)
+        self.isolated_vertices = [i for i in range(vertex_count) if i not in connected]
+        if self.isolated_vertices:
+            names = [self.vertices[i][2] or str(i) for i in self.isolated_vertices]
+            print(f"Warning: Vertices with no lanes cannot be reached: {names}")
+
     def build_adjacency_list(self):
         """Build adjacency list for efficient path finding"""
         self.adjacency_list = {i: [] for i in range(len(self.vertices))}
@@ -34,10 +98,96 @@ class NavGraph:
             self.adjacency_list[start].append(end)
             self.adjacency_list[end].append(start)  # Undirected graph
 
+    def signature(self):
+        """Content hash of vertices and lanes, used to match preprocessed data and snapshots to this graph"""
+        if self._signature is None:
+            self._signature = hashlib.sha1(repr((self.vertices, self.lanes)).encode()).hexdigest()[:16]
+        return self._signature
+
+    def lane_length(self, start_vertex, end_vertex):
+        """Euclidean length of a lane in graph coordinates"""
+        x1, y1 = self.vertices[start_vertex][0], self.vertices[start_vertex][1]
+        x2, y2 = self.vertices[end_vertex][0], self.vertices[end_vertex][1]
+        return ((x2 - x1)**2 + (y2 - y1)**2)**0.5
+
+    def speed_limit(self, start_vertex, end_vertex):
+        """Speed limit of a lane in graph units per second, or None if it has none"""
+        return self.speed_limits.get((start_vertex, end_vertex))
+
+    def partition(self, zone_count):
+        """Split the vertices into zone_count spatially compact zones of near-equal size.
+
+        Recursive coordinate bisection: each group is cut across its longer axis,
+        in proportion to the number of zones each side gets. Returns the zone of every vertex.
+        """
+        zones = [0] * len(self.vertices)
+        groups = [(list(range(len(self.vertices))), 0, max(1, zone_count))]
+        while groups:
+            members, first_zone, count = groups.pop()
+            if count == 1 or len(members) <= 1:
+                for vertex in members:
+                    zones[vertex] = first_zone
+                continue
+            xs = [self.vertices[v][0] for v in members]
+            ys = [self.vertices[v][1] for v in members]
+            axis = 0 if max(xs) - min(xs) >= max(ys) - min(ys) else 1
+            members.sort(key=lambda v: (self.vertices[v][axis], v))
+            left_count = count // 2
+            cut = len(members) * left_count // count
+            groups.append((members[:cut], first_zone, left_count))
+            groups.append((members[cut:], first_zone + left_count, count - left_count))
+        return zones
+
+    def close_lane(self, start_vertex, end_vertex):
+        """Stop routing through a lane, e.g. while it is blocked or under maintenance"""
+        if (start_vertex, end_vertex) not in self.closed_lanes:
+            self.closed_lanes.add((start_vertex, end_vertex))
+            self.reachability.lane_closed(start_vertex, end_vertex)
+
+    def open_lane(self, start_vertex, end_vertex):
+        """Allow routing through a previously closed lane"""
+        if (start_vertex, end_vertex) in self.closed_lanes:
+            self.closed_lanes.discard((start_vertex, end_vertex))
+            self.reachability.lane_opened(start_vertex, end_vertex)
+
+    def is_reachable(self, start_vertex, end_vertex):
+        """Check in O(1) whether any open route leads from start to end"""
+        return self.reachability.is_reachable(start_vertex, end_vertex)
+
+    def build_hierarchy(self, save=True):
+        """Preprocess the graph into a contraction hierarchy, saved next to the graph file"""
+        self.hierarchy = ContractionHierarchy.build(self)
+        if save and self.file_path:
+            self.hierarchy.save(hierarchy_path(self.file_path))
+        return self.hierarchy
+
+    def load_hierarchy(self):
+        """Attach a previously saved contraction hierarchy if it matches this graph"""
+        if not self.file_path:
+            return
+        try:
+            hierarchy = ContractionHierarchy.load(hierarchy_path(self.file_path))
+        except Exception as e:
+            print(f"Ignoring unreadable contraction hierarchy: {e}")
+            return
+        if hierarchy is not None and hierarchy.signature == self.signature():
+            self.hierarchy = hierarchy
+
     def find_path(self, start_vertex, end_vertex):
-        """Find shortest path between two vertices using BFS"""
+        """Find shortest path between two vertices.
+
+        Uses the contraction hierarchy (shortest by lane length) when one is attached
+        and no lanes are closed, a plain A* when lanes are closed, and BFS (fewest
+        lanes) otherwise.
+        """
         if start_vertex is None or end_vertex is None:
             return None
+        if not self.is_reachable(start_vertex, end_vertex):
+            return None  # Answered by the reachability index without searching
+        if self.hierarchy is not None:
+            if not self.closed_lanes:
+                return self.hierarchy.query(start_vertex, end_vertex)
+            return self.find_shortest_path(start_vertex, end_vertex)
             
         # Initialize BFS
         queue = deque([(start_vertex, [start_vertex])])
@@ -52,8 +202,34 @@ class NavGraph:
                 
             # Explore neighbors
             for neighbor in self.adjacency_list[current]:
-                if neighbor not in visited:
+                if neighbor not in visited and (current, neighbor) not in self.closed_lanes:
                     visited.add(neighbor)
                     queue.append((neighbor, path + [neighbor]))
         
         return None  # No path found
+
+    def find_shortest_path(self, start_vertex, end_vertex, avoid_lanes=()):
+        """Find the shortest path by lane length using A*, skipping closed lanes and avoid_lanes"""
+        def heuristic(vertex):
+            return self.lane_length(vertex, end_vertex)
+
+        dist = {start_vertex: 0.0}
+        parent = {start_vertex: None}
+        heap = [(heuristic(start_vertex), start_vertex)]
+        while heap:
+            _, current = heapq.heappop(heap)
+            if current == end_vertex:
+                path = []
+                while current is not None:
+                    path.append(current)
+                    current = parent[current]
+                return path[::-1]
+            for neighbor in self.adjacency_list[current]:
+                if (current, neighbor) in self.closed_lanes or (current, neighbor) in avoid_lanes:
+                    continue
+                new_dist = dist[current] + self.lane_length(current, neighbor)
+                if new_dist < dist.get(neighbor, float('inf')):
+                    dist[neighbor] = new_dist
+                    parent[neighbor] = current
+                    heapq.heappush(heap, (new_dist + heuristic(neighbor), neighbor))
+        return None  # No path found
@@ -0,0 +1,159 @@
+from typing import Dict, List, Optional, Set
+
+
+class ReachabilityIndex:
+    """Strongly connected components of a NavGraph's routable lanes, with reachability between them.
+
+    Every vertex gets a component ID; for each component a bitset (a Python int)
+    records which components it can reach, so is_reachable() is a lookup and a
+    bit test. Opening a lane updates the bitsets in place unless it closes a
+    cycle; closing a lane re-runs Tarjan only on the component it was in.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.component: List[int] = []  # vertex -> component ID
+        self.members: Dict[int, List[int]] = {}  # component ID -> vertices
+        self.reach: Dict[int, int] = {}  # component ID -> bitset of reachable components
+        self._next_id = 0
+        self.rebuild()
+
+    def _successors(self, vertex):
+        closed = self.graph.closed_lanes
+        return [n for n in self.graph.adjacency_list[vertex] if (vertex, n) not in closed]
+
+    def _tarjan(self, vertices) -> List[List[int]]:
+        """Iterative Tarjan over the given vertices. Components come out sinks first."""
+        allowed = set(vertices)
+        index: Dict[int, int] = {}
+        lowlink: Dict[int, int] = {}
+        on_stack: Set[int] = set()
+        stack: List[int] = []
+        components = []
+        counter = 0
+        for root in vertices:
+            if root in index:
+                continue
+            work = [(root, iter(self._successors(root)))]
+            index[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                vertex, successors = work[-1]
+                advanced = False
+                for successor in successors:
+                    if successor not in allowed:
+                        continue
+                    if successor not in index:
+                        index[successor] = lowlink[successor] = counter
+                        counter += 1
+                        stack.append(successor)
+                        on_stack.add(successor)
+                        work.append((successor, iter(self._successors(successor))))
+                        advanced = True
+                        break
+                    if successor in on_stack:
+                        lowlink[vertex] = min(lowlink[vertex], index[successor])
+                if advanced:
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[vertex])
+                if lowlink[vertex] == index[vertex]:
+                    members = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        members.append(member)
+                        if member == vertex:
+                            break
+                    components.append(members)
+        return components
+
+    def rebuild(self):
+        """Recompute components and reachability from scratch"""
+        vertex_count = len(self.graph.vertices)
+        self.component = [0] * vertex_count
+        self.members = {}
+        self._next_id = 0
+        for members in self._tarjan(range(vertex_count)):
+            self._add_component(members)
+        self._rebuild_reach()
+
+    def _add_component(self, members):
+        component_id = self._next_id
+        self._next_id += 1
+        self.members[component_id] = members
+        for vertex in members:
+            self.component[vertex] = component_id
+        return component_id
+
+    def _rebuild_reach(self):
+        """Recompute reachability bitsets over the condensation"""
+        successors: Dict[int, Set[int]] = {c: set() for c in self.members}
+        for vertex, neighbors in self.graph.adjacency_list.items():
+            source = self.component[vertex]
+            for neighbor in neighbors:
+                target = self.component[neighbor]
+                if target != source and (vertex, neighbor) not in self.graph.closed_lanes:
+                    successors[source].add(target)
+        self.reach = {}
+        # Visit successors before predecessors (post-order DFS over the condensation DAG)
+        for start in self.members:
+            if start in self.reach:
+                continue
+            work = [(start, iter(successors[start]))]
+            while work:
+                component_id, pending = work[-1]
+                for successor in pending:
+                    if successor not in self.reach:
+                        work.append((successor, iter(successors[successor])))
+                        break
+                else:
+                    work.pop()
+                    bits = 1 << component_id
+                    for successor in successors[component_id]:
+                        bits |= self.reach[successor]
+                    self.reach[component_id] = bits
+
+    def is_reachable(self, start_vertex, end_vertex) -> bool:
+        """Check whether any open route leads from start to end"""
+        source = self.component[start_vertex]
+        target = self.component[end_vertex]
+        return source == target or bool((self.reach[source] >> target) & 1)
+
+    def lane_opened(self, start_vertex, end_vertex):
+        """Update the index after a lane became routable"""
+        source = self.component[start_vertex]
+        target = self.component[end_vertex]
+        if source == target or (self.reach[source] >> target) & 1:
+            return  # Nothing new becomes reachable
+        if (self.reach[target] >> source) & 1:
+            # The new lane closes a cycle, merging components
+            self.rebuild()
+            return
+        # Everything that reaches the source now also reaches whatever the target reaches
+        gained = self.reach[target]
+        for component_id, bits in self.reach.items():
+            if (bits >> source) & 1:
+                self.reach[component_id] = bits | gained
+
+    def lane_closed(self, start_vertex, end_vertex):
+        """Update the index after a lane stopped being routable"""
+        component_id = self.component[start_vertex]
+        if component_id == self.component[end_vertex]:
+            # Only this component can split
+            members = self.members.pop(component_id)
+            for split in self._tarjan(members):
+                self._add_component(split)
+        self._rebuild_reach()
+
+    def components(self) -> List[List[int]]:
+        """Vertices grouped by strongly connected component"""
+        return list(self.members.values())
+
+    def component_of(self, vertex) -> Optional[int]:
+        """Component ID of a vertex"""
+        return self.component[vertex] if 0 <= vertex < len(self.component) else None
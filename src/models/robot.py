@@ -10,6 +10,20 @@ class Robot:
     STATUS_COMPLETE = "COMPLETE"
     STATUS_BLOCKED = "BLOCKED"  # New status for when robot is blocked by traffic
 
+    DEFAULT_SPEED = 2  # pixels per update
+
+    # Attributes captured by get_state() / restored by from_state(), in order
+    STATE_FIELDS = (
+        'id', 'x', 'y', 'status', 'previous_status', 'current_vertex',
+        'destination_vertex', 'path', 'vertex_path', 'original_path_length', 'speed',
+        'wait_time', 'previous_location', 'initial_location', 'source_vertex',
+        'has_moved_from_spawn', 'spawn_x', 'spawn_y', 'has_completed_first_move',
+        'current_lane', 'lane_entry_distance', 'waiting_for_lane', 'waiting_for_vertex', 'blocked_reason',
+        'idle_since', 'stops'
+    )
+    LIST_FIELDS = ('path', 'vertex_path', 'stops')  # Copied in and out of state tuples
+    __slots__ = STATE_FIELDS  # No per-instance __dict__, fleets hold many robots
+
     def __init__(self, x, y):
         Robot.robot_count += 1
         self.id = f"R{Robot.robot_count}"
@@ -20,8 +34,9 @@ class Robot:
         self.current_vertex = None
         self.destination_vertex = None
         self.path = []
+        self.vertex_path = []  # Vertex IDs matching the points in the assigned path
         self.original_path_length = 0  # Store original path length
-        self.speed = 2  # pixels per update
+        self.speed = self.DEFAULT_SPEED
         self.wait_time = 0
         self.previous_location = None
         self.initial_location = None  # Store the initial spawn location
@@ -31,13 +46,17 @@ class Robot:
         self.spawn_y = y
         self.has_completed_first_move = False  # Track if first movement is complete
         self.current_lane = None  # Current lane being used
+        self.lane_entry_distance = 0  # Distance to the lane's end when the robot entered it
         self.waiting_for_lane = None  # Lane the robot is waiting for
         self.waiting_for_vertex = None  # Vertex the robot is waiting for
         self.blocked_reason = None  # Reason for being blocked
+        self.idle_since = None  # Tick the robot last became idle after a task
+        self.stops = []  # Stops of a multi-stop task still to visit, in order
 
-    def assign_task(self, destination_vertex, path=None):
-        """Assign a navigation task to the robot"""
+    def assign_task(self, destination_vertex, path=None, vertex_path=None, stops=None):
+        """Assign a navigation task to the robot. A multi-stop task passes its stops in visit order."""
         self.destination_vertex = destination_vertex
+        self.stops = list(stops) if stops else [destination_vertex]
         self.previous_status = self.status
         self.status = self.STATUS_MOVING
         if path:
@@ -45,6 +64,7 @@ class Robot:
             # Path length is number of edges (vertices - 1)
             self.original_path_length = len(path) - 1 if len(path) > 0 else 0
             self.source_vertex = self.current_vertex  # Store current vertex as source
+            self.vertex_path = list(vertex_path) if vertex_path else []
 
     def update(self, traffic_manager: TrafficManager):
         """Update robot state with traffic management"""
@@ -54,44 +74,73 @@ class Robot:
                 next_x, next_y = self.path[0]
                 next_vertex = self.find_next_vertex(next_x, next_y)
                 
+                # Distance to next point in path
+                dx = next_x - self.x
+                dy = next_y - self.y
+                distance = (dx**2 + dy**2)**0.5
+                step = self.speed
+                
                 if next_vertex is not None:
-                    # Request permission to use the lane
-                    if self.current_vertex is not None:
+                    lane = None
+                    if self.current_vertex is not None and self.current_vertex != next_vertex:
                         lane = (self.current_vertex, next_vertex)
-                        if not traffic_manager.request_lane(self.id, self.current_vertex, next_vertex):
+                    
+                    if lane is not None and self.current_lane != lane:
+                        # Request permission to enter the lane. On a short lane the far vertex is needed
+                        # straight away, so take both or neither rather than holding the lane while blocked.
+                        vertex = next_vertex if distance <= max(traffic_manager.min_headway, self.speed) else None
+                        if not traffic_manager.acquire(self.id, lane, vertex):
                             self.status = self.STATUS_BLOCKED
                             self.waiting_for_lane = lane
-                            self.blocked_reason = f"Lane {lane} is occupied"
+                            self.waiting_for_vertex = vertex
+                            self.blocked_reason = traffic_manager.wait_reason(self.id) or f"Lane {lane} is occupied"
                             traffic_manager.log_collision(self.id, f"Lane {lane}", "WAITING")
                             return
+                        self.current_lane = lane
+                        self.lane_entry_distance = distance
                     
-                    # Request permission to occupy next vertex
-                    if not traffic_manager.request_vertex(self.id, next_vertex):
-                        self.status = self.STATUS_BLOCKED
-                        self.waiting_for_vertex = next_vertex
-                        self.blocked_reason = f"Vertex {next_vertex} is occupied"
-                        traffic_manager.log_collision(self.id, f"Vertex {next_vertex}", "WAITING")
-                        return
+                    reserve_distance = max(traffic_manager.min_headway, self.speed)
+                    if lane is not None:
+                        # Report progress and keep the following distance to the robot ahead
+                        progress = self.lane_entry_distance - distance
+                        traffic_manager.update_lane_progress(self.id, progress)
+                        if progress >= traffic_manager.min_headway or distance <= reserve_distance:
+                            # Clear of the vertex we left, let the next robot have it. Never hold
+                            # both ends of a lane, or two robots can each hold what the other needs.
+                            traffic_manager.release_vertex(self.id, self.current_vertex)
+                        step = min(step, traffic_manager.get_headway_limit(self.id, lane))
+                    
+                    # Reserve the next vertex only when approaching it, so robots can follow each other down a lane
+                    if lane is None or distance <= reserve_distance:
+                        if not traffic_manager.request_vertex(self.id, next_vertex):
+                            self.status = self.STATUS_BLOCKED
+                            self.waiting_for_vertex = next_vertex
+                            self.blocked_reason = (traffic_manager.wait_reason(self.id)
+                                                   or f"Vertex {next_vertex} is occupied")
+                            traffic_manager.log_collision(self.id, f"Vertex {next_vertex}", "WAITING")
+                            return
                 
-                # Move towards next point in path
-                dx = next_x - self.x
-                dy = next_y - self.y
-                distance = (dx**2 + dy**2)**0.5
+                if step <= 0:
+                    # Holding the following distance behind the robot ahead
+                    return
                 
-                if distance < self.speed:
+                if distance <= step:
                     # Release previous vertex if exists
-                    if self.current_vertex is not None:
+                    if self.current_vertex is not None and self.current_vertex != next_vertex:
                         traffic_manager.release_vertex(self.id, self.current_vertex)
                     
                     # Release previous lane if exists
                     if self.current_lane is not None:
                         traffic_manager.release_lane(self.id, self.current_lane[0], self.current_lane[1])
+                        self.current_lane = None
                     
                     self.previous_location = (self.x, self.y)
                     self.x = next_x
                     self.y = next_y
-                    self.current_vertex = next_vertex
-                    self.current_lane = (self.current_vertex, next_vertex)
+                    if next_vertex is not None:
+                        self.current_vertex = next_vertex
+                        if self.stops and self.stops[0] == next_vertex:
+                            self.stops.pop(0)
                     
                     if not self.has_moved_from_spawn and (self.x != self.spawn_x or self.y != self.spawn_y):
                         self.has_moved_from_spawn = True
@@ -103,8 +152,8 @@ class Robot:
                         if not self.has_completed_first_move:
                             self.has_completed_first_move = True
                 else:
-                    self.x += (dx/distance) * self.speed
-                    self.y += (dy/distance) * self.speed
+                    self.x += (dx/distance) * step
+                    self.y += (dy/distance) * step
                     if not self.has_moved_from_spawn and (abs(self.x - self.spawn_x) > self.speed or abs(self.y - self.spawn_y) > self.speed):
                         self.has_moved_from_spawn = True
             else:
@@ -119,32 +168,33 @@ class Robot:
                 self.previous_status = self.status
                 self.status = self.STATUS_MOVING
         elif self.status == self.STATUS_BLOCKED:
-            # Check if we can proceed
-            if self.waiting_for_lane:
-                if traffic_manager.request_lane(self.id, self.waiting_for_lane[0], self.waiting_for_lane[1]):
+            # Check if we can proceed, taking everything we wait for at once
+            if self.waiting_for_lane or self.waiting_for_vertex is not None:
+                if traffic_manager.acquire(self.id, self.waiting_for_lane, self.waiting_for_vertex):
                     self.status = self.STATUS_MOVING
                     self.waiting_for_lane = None
-                    self.blocked_reason = None
-            elif self.waiting_for_vertex:
-                if traffic_manager.request_vertex(self.id, self.waiting_for_vertex):
-                    self.status = self.STATUS_MOVING
                     self.waiting_for_vertex = None
                     self.blocked_reason = None
+                else:
+                    # What blocks it can change while it waits, e.g. from the lane to the robot at its end
+                    self.blocked_reason = traffic_manager.wait_reason(self.id) or self.blocked_reason
         elif self.status == self.STATUS_COMPLETE:
-            # Release any remaining resources
-            if self.current_vertex is not None:
-                traffic_manager.release_vertex(self.id, self.current_vertex)
+            # Release the lane but keep the vertex: a parked robot still takes up its spot
             if self.current_lane is not None:
                 traffic_manager.release_lane(self.id, self.current_lane[0], self.current_lane[1])
+                self.current_lane = None
             
             self.destination_vertex = None
+            self.vertex_path = []
+            self.stops = []
             self.previous_status = self.status
             self.status = self.STATUS_IDLE
 
     def find_next_vertex(self, x, y):
         """Find the vertex ID for given coordinates"""
-        # This should be implemented based on your graph structure
-        # For now, return None as placeholder
+        # The remaining path points line up with the tail of vertex_path
+        if self.vertex_path and len(self.path) <= len(self.vertex_path):
+            return self.vertex_path[len(self.vertex_path) - len(self.path)]
         return None
 
     def has_moved(self):
@@ -170,6 +220,31 @@ class Robot:
         """Check if robot should be removed"""
         return self.has_completed_first_move and self.status == self.STATUS_IDLE
 
+    def get_state(self):
+        """Get a plain tuple of the robot's state for snapshotting"""
+        state = []
+        for field in self.STATE_FIELDS:
+            value = getattr(self, field)
+            if field in self.LIST_FIELDS:
+                value = list(value)  # Mutated as the robot moves, so the snapshot needs its own copy
+            state.append(value)
+        return tuple(state)
+
+    @classmethod
+    def from_state(cls, state, fields=None):
+        """Rebuild a robot from a tuple produced by get_state() without bumping robot_count"""
+        robot = cls.__new__(cls)
+        # Older snapshots may not carry every field
+        robot.vertex_path = []
+        robot.lane_entry_distance = 0
+        robot.idle_since = None
+        robot.stops = []
+        for field, value in zip(fields or cls.STATE_FIELDS, state):
+            if field in cls.LIST_FIELDS:
+                value = list(value)
+            setattr(robot, field, value)
+        return robot
+
     def get_status_details(self):
         """Get detailed status information"""
         details = {
@@ -177,6 +252,7 @@ class Robot:
             'status': self.status,
             'current_vertex': self.current_vertex,
             'destination_vertex': self.destination_vertex,
+            'stops': list(self.stops),
             'waiting_for_lane': self.waiting_for_lane,
             'waiting_for_vertex': self.waiting_for_vertex,
             'blocked_reason': self.blocked_reason
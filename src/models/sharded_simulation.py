@@ -0,0 +1,483 @@
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from src.models.fleet_simulation import DEADLOCK_CHECK_TICKS, FleetSimulation
+from src.models.robot import Robot
+from src.models.traffic_manager import TrafficManager, find_cycles
+from src.utils.state_stream import STATUS_CODES, STATUS_INDEX
+
+SLOT_FIELDS = 4  # x, y, status code, zone
+EMPTY_ZONE = -1.0  # Zone value of a slot no robot uses
+
+# Messages between zones: (kind, to_zone, from_zone, robot_id, resource, value)
+# kind is "acquire", "grant", "deny", "release" or "progress";
+# a resource is ("lane", (start, end)) or ("vertex", vertex_id). For "acquire",
+# "grant" and "deny" it is a tuple of resources, granted or denied together.
+# The value of a "deny" is the robots holding what was refused.
+
+
+class SharedFleetState:
+    """Robot positions and statuses in shared memory, one fixed slot of doubles per robot.
+
+    Workers write the slots of the robots they simulate after every tick, and the
+    coordinator (or anything else attached by name) reads them without messages.
+    """
+
+    def __init__(self, capacity, name=None):
+        self.capacity = capacity
+        size = capacity * SLOT_FIELDS * 8
+        self.memory = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.values = self.memory.buf.cast("d")
+        if name is None:
+            for slot in range(capacity):
+                self.clear(slot)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def write(self, slot, robot: Robot, zone):
+        base = slot * SLOT_FIELDS
+        self.values[base] = robot.x
+        self.values[base + 1] = robot.y
+        self.values[base + 2] = STATUS_INDEX.get(robot.status, -1)
+        self.values[base + 3] = zone
+
+    def clear(self, slot):
+        self.values[slot * SLOT_FIELDS + 3] = EMPTY_ZONE
+
+    def read(self, slot) -> Optional[Tuple[float, float, Optional[str], int]]:
+        """(x, y, status, zone) of a slot, or None if it is empty"""
+        base = slot * SLOT_FIELDS
+        zone = self.values[base + 3]
+        if zone == EMPTY_ZONE:
+            return None
+        code = int(self.values[base + 2])
+        status = STATUS_CODES[code] if 0 <= code < len(STATUS_CODES) else None
+        return self.values[base], self.values[base + 1], status, int(zone)
+
+    def close(self, unlink=False):
+        self.values.release()
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+
+class ZoneTrafficManager(TrafficManager):
+    """Traffic manager for one zone of a sharded simulation.
+
+    Lanes and vertices the zone owns are arbitrated locally as usual. For ones
+    owned by another zone, requests, releases and lane progress are queued in
+    `outbox` for the coordinator to deliver, and acquire() answers from the
+    grants that came back. Both directions of a lane have the same owner, so
+    oncoming traffic is still checked in one place. The remote parts of a
+    request are asked for in one message per owning zone and taken before the
+    local part. If any part is refused, the parts already granted are given
+    back, so no robot keeps half of a request.
+
+    A robot waiting on another zone counts as waiting here, on the robots the
+    owner reported holding the resource. Wait cycles that span zones are found
+    by the coordinator from every zone's wait_edges() and handed to one zone
+    at a time in `shared_cycles`, to be broken along with its own.
+    """
+
+    def __init__(self, zone, vertex_zones, min_headway=30.0):
+        super().__init__(min_headway)
+        self.zone = zone
+        self.vertex_zones = vertex_zones
+        self.remote_held: Dict[str, Set[Tuple]] = {}  # robot_id -> resources it holds in other zones
+        self.fresh_grants: Set[Tuple[str, Tuple]] = set()  # (robot_id, resource) granted but not yet used
+        self.pending: Dict[str, Set[Tuple]] = {}  # robot_id -> requests awaiting an answer
+        self.refused: Set[str] = set()  # Robots with a request refused by one zone and pending in another
+        self.remote_waits: Dict[str, List[str]] = {}  # robot_id -> holders of what another zone refused it
+        self.shared_cycles: List[List[str]] = []  # Wait cycles across zones this zone is to break next
+        self.outbox: List[Tuple] = []
+
+    def owner(self, resource) -> int:
+        """Zone that arbitrates a resource"""
+        kind, key = resource
+        if kind == "lane":
+            return self.vertex_zones[min(key)]
+        return self.vertex_zones[key]
+
+    @staticmethod
+    def _location(resource) -> Tuple[int, int]:
+        """A resource as a waiting location, (start, end) of a lane or (vertex, vertex)"""
+        kind, key = resource
+        return (key[0], key[1]) if kind == "lane" else (key, key)
+
+    def _send(self, kind, resource, robot_id, to_zone=None, value=None):
+        to_zone = self.owner(resource) if to_zone is None else to_zone
+        self.outbox.append((kind, to_zone, self.zone, robot_id, resource, value))
+
+    def acquire(self, robot_id: str, lane: Optional[Tuple[int, int]] = None,
+                vertex_id: Optional[int] = None) -> bool:
+        remote = []
+        if lane is not None and self.owner(("lane", lane)) != self.zone:
+            remote.append(("lane", (lane[0], lane[1])))
+            lane = None
+        if vertex_id is not None and self.vertex_zones[vertex_id] != self.zone:
+            remote.append(("vertex", vertex_id))
+            vertex_id = None
+        if not remote:
+            return super().acquire(robot_id, lane, vertex_id)
+        if self.pending.get(robot_id):
+            self._wait(robot_id, self._location(remote[0]))  # Still waiting for an answer
+            return False
+        held = self.remote_held.setdefault(robot_id, set())
+        missing = [resource for resource in remote if resource not in held]
+        if missing:
+            self._release_fresh(robot_id)  # Left from a request for somewhere else
+            self._request(robot_id, missing)
+            self._wait(robot_id, self._location(missing[0]))
+            return False
+        if super().acquire(robot_id, lane, vertex_id):
+            self._stop_waiting(robot_id)  # Granted remotely, the local part may have been nothing to grant
+            for resource in remote:
+                self.fresh_grants.discard((robot_id, resource))
+            return True
+        # Refused locally: give back what was granted for this request
+        for resource in remote:
+            if (robot_id, resource) in self.fresh_grants:
+                self._release_remote(robot_id, resource)
+        return False
+
+    def _stop_waiting(self, robot_id: str) -> int:
+        self.remote_waits.pop(robot_id, None)
+        return super()._stop_waiting(robot_id)
+
+    def waits_for(self, robot_id: str) -> List[str]:
+        location = self.waiting_robots.get(robot_id)
+        if location is None:
+            return []
+        resource = ("vertex", location[0]) if location[0] == location[1] else ("lane", location)
+        if self.owner(resource) != self.zone:
+            return list(self.remote_waits.get(robot_id, ()))
+        return super().waits_for(robot_id)
+
+    def find_wait_cycles(self) -> List[List[str]]:
+        cycles = super().find_wait_cycles() + self.shared_cycles
+        self.shared_cycles = []
+        return cycles
+
+    def _request(self, robot_id, resources):
+        """Ask each owning zone for its share of resources in one message"""
+        by_zone: Dict[int, List[Tuple]] = {}
+        for resource in resources:
+            by_zone.setdefault(self.owner(resource), []).append(resource)
+        for zone, request in by_zone.items():
+            request = tuple(request)
+            self.pending.setdefault(robot_id, set()).add(request)
+            self._send("acquire", request, robot_id, to_zone=zone)
+
+    def _release_fresh(self, robot_id):
+        """Give back everything granted to a robot that it has not used yet"""
+        for entry in [entry for entry in self.fresh_grants if entry[0] == robot_id]:
+            self._release_remote(robot_id, entry[1])
+
+    def _answered(self, robot_id, request):
+        requests = self.pending.get(robot_id)
+        if requests is not None:
+            requests.discard(request)
+            if not requests:
+                del self.pending[robot_id]
+                self.refused.discard(robot_id)
+
+    def _release_remote(self, robot_id, resource):
+        held = self.remote_held.get(robot_id)
+        if held and resource in held:
+            held.discard(resource)
+            self.fresh_grants.discard((robot_id, resource))
+            self._send("release", resource, robot_id)
+
+    def release_lane(self, robot_id: str, start_vertex: int, end_vertex: int):
+        resource = ("lane", (start_vertex, end_vertex))
+        if self.owner(resource) != self.zone:
+            self._release_remote(robot_id, resource)
+        else:
+            super().release_lane(robot_id, start_vertex, end_vertex)
+
+    def release_vertex(self, robot_id: str, vertex_id: int):
+        resource = ("vertex", vertex_id)
+        if self.owner(resource) != self.zone:
+            self._release_remote(robot_id, resource)
+        else:
+            super().release_vertex(robot_id, vertex_id)
+
+    def release_all(self, robot_id: str):
+        super().release_all(robot_id)
+        for resource in list(self.remote_held.get(robot_id, ())):
+            self._release_remote(robot_id, resource)
+        self.remote_held.pop(robot_id, None)
+        self.pending.pop(robot_id, None)
+        self.refused.discard(robot_id)
+
+    def update_lane_progress(self, robot_id: str, progress: float):
+        if robot_id in self.lane_progress:
+            super().update_lane_progress(robot_id, progress)
+            return
+        for resource in self.remote_held.get(robot_id, ()):
+            if resource[0] == "lane":
+                self._send("progress", resource, robot_id, value=progress)
+
+    def get_headway_limit(self, robot_id: str, lane: Tuple[int, int]) -> float:
+        if self.owner(("lane", lane)) != self.zone:
+            return float('inf')  # Followers on another zone's lane are spaced by its entry check
+        return super().get_headway_limit(robot_id, lane)
+
+    def receive(self, message):
+        """Handle a message from another zone"""
+        kind, _, from_zone, robot_id, resource, value = message
+        if kind == "acquire":
+            # The parts this zone owns, taken together or not at all
+            lane = next((key for part, key in resource if part == "lane"), None)
+            vertex_id = next((key for part, key in resource if part == "vertex"), None)
+            granted = TrafficManager.acquire(self, robot_id, lane, vertex_id)
+            if granted:
+                self._send("grant", resource, robot_id, to_zone=from_zone)
+                return
+            holders = self.waits_for(robot_id)
+            self._stop_waiting(robot_id)  # The robot's own zone keeps track of its wait
+            self._send("deny", resource, robot_id, to_zone=from_zone, value=holders)
+            return
+        if kind == "grant":
+            if resource in self.pending.get(robot_id, ()) and robot_id not in self.refused:
+                self.remote_held.setdefault(robot_id, set()).update(resource)
+                self.fresh_grants.update((robot_id, part) for part in resource)
+            else:
+                # Another part was refused, or the robot gave up on it (e.g. it was removed): hand it straight back
+                for part in resource:
+                    self._send("release", part, robot_id)
+            self._answered(robot_id, resource)
+            return
+        if kind == "deny":
+            # Half a request is no use, give back the parts other zones granted
+            self._release_fresh(robot_id)
+            if len(self.pending.get(robot_id, ())) > 1:
+                self.refused.add(robot_id)
+            if robot_id in self.waiting_robots:
+                self.remote_waits[robot_id] = list(value or ())
+            self._answered(robot_id, resource)
+            return
+        lane, vertex_id = (resource[1], None) if resource[0] == "lane" else (None, resource[1])
+        if kind == "release":
+            if lane is not None:
+                TrafficManager.release_lane(self, robot_id, lane[0], lane[1])
+            else:
+                TrafficManager.release_vertex(self, robot_id, vertex_id)
+        elif kind == "progress":
+            TrafficManager.update_lane_progress(self, robot_id, value)
+
+    def hand_over(self, robot_id) -> List[Tuple]:
+        """Everything a departing robot holds, in this zone and elsewhere"""
+        held = set(self.remote_held.pop(robot_id, ()))
+        for lane, robot_ids in list(self.occupied_lanes.items()):
+            if robot_id in robot_ids:
+                held.add(("lane", lane))
+        for vertex_id, holder in list(self.occupied_vertices.items()):
+            if holder == robot_id:
+                held.add(("vertex", vertex_id))
+        self.fresh_grants = {entry for entry in self.fresh_grants if entry[0] != robot_id}
+        self.pending.pop(robot_id, None)
+        self.refused.discard(robot_id)
+        self._stop_waiting(robot_id)
+        return sorted(held)
+
+    def take_over(self, robot_id, held):
+        """Record what an arriving robot holds in other zones"""
+        remote = {resource for resource in held if self.owner(resource) != self.zone}
+        if remote:
+            self.remote_held[robot_id] = remote
+
+
+def _zone_worker(zone, graph_path, vertex_map, vertex_zones, min_headway, state_name, capacity, connection):
+    """Simulate one zone: receive an inbox, step once, send back the outbox, until told to stop"""
+    from src.models.nav_graph import NavGraph
+
+    traffic_manager = ZoneTrafficManager(zone, vertex_zones, min_headway)
+    simulation = FleetSimulation(NavGraph(graph_path), vertex_map, traffic_manager=traffic_manager)
+    state = SharedFleetState(capacity, name=state_name)
+    slots: Dict[str, int] = {}
+    try:
+        while True:
+            inbox = connection.recv()
+            if inbox is None:
+                break
+            for robot_id, vertex, slot in inbox["spawn"]:
+                simulation.spawn_robot(vertex, robot_id=robot_id)
+                slots[robot_id] = slot
+            for robot_state, held, slot in inbox["arrivals"]:
+                robot = Robot.from_state(robot_state)
+                simulation.attach_robot(robot)
+                traffic_manager.take_over(robot.id, held)
+                slots[robot.id] = slot
+            for message in inbox["messages"]:
+                traffic_manager.receive(message)
+            traffic_manager.shared_cycles.extend(inbox["cycles"])
+            for robot_id, destination in inbox["tasks"]:
+                robot = simulation.get_robot(robot_id)
+                if robot is not None:
+                    simulation.assign_task(robot, destination)
+            for robot_id in inbox["remove"]:
+                robot = simulation.get_robot(robot_id)
+                if robot is not None:
+                    simulation.remove_robot(robot)
+                    state.clear(slots.pop(robot_id))
+
+            changes = simulation.step()
+            completed = sum(1 for robot, old_status in changes if robot.status == Robot.STATUS_COMPLETE)
+
+            # Robots that arrived at another zone's vertex move to that zone's worker
+            departures = []
+            for robot in list(simulation.robots):
+                if robot.current_vertex is not None and vertex_zones[robot.current_vertex] != zone:
+                    simulation.detach_robot(robot)
+                    departures.append((vertex_zones[robot.current_vertex], robot.get_state(),
+                                       traffic_manager.hand_over(robot.id), slots.pop(robot.id)))
+                    continue
+                state.write(slots[robot.id], robot, zone)
+            # Wait-for edges for the coordinator to look for cycles across zones, before each deadlock check
+            waits = traffic_manager.wait_edges() if simulation.tick % DEADLOCK_CHECK_TICKS == 0 else {}
+            connection.send({"messages": traffic_manager.outbox, "departures": departures,
+                             "completed": completed, "waits": waits})
+            traffic_manager.outbox = []
+    finally:
+        state.close()
+        connection.close()
+
+
+class ShardedFleetSimulation:
+    """Runs a fleet across worker processes, one per zone of the navigation graph.
+
+    The graph is partitioned into compact zones (NavGraph.partition) and each
+    worker simulates the robots inside its zone with its own ZoneTrafficManager.
+    A tick is one round trip: every worker gets its inbox (commands, arriving
+    robots, messages from other zones), steps, and replies; the coordinator
+    then routes the replies. A robot reaching a vertex of another zone is
+    handed over with everything it holds, and cross-zone lanes and border
+    vertices are requested from their owning zone. Positions and statuses are
+    published through SharedFleetState rather than sent back every tick.
+    Before every deadlock check the coordinator merges the zones' wait-for
+    edges and hands each wait cycle spanning zones to one of them to break,
+    taking turns between the zones involved.
+    """
+
+    def __init__(self, graph, zone_count, vertex_map=None, min_headway=30.0, capacity=10000):
+        if not graph.file_path:
+            print("Error: A sharded simulation needs a graph loaded from a file")
+            raise ValueError("Graph has no file path for the zone workers to load")
+        if vertex_map is None:
+            vertex_map = {i: (x, y) for i, (x, y, name) in enumerate(graph.vertices)}
+        self.graph = graph
+        self.zone_count = zone_count
+        self.vertex_zones = graph.partition(zone_count)
+        self.state = SharedFleetState(capacity)
+        self.robot_zones: Dict[str, int] = {}  # robot_id -> zone currently simulating it
+        self.robot_slots: Dict[str, int] = {}  # robot_id -> shared memory slot
+        self.free_slots = list(range(capacity - 1, -1, -1))
+        self._retiring_slots: List[int] = []  # Freed once the owning worker has cleared them
+        self.tick = 0
+        self.completed = 0
+        self._next_id = 0
+        self._inboxes = [self._empty_inbox() for _ in range(zone_count)]
+        context = multiprocessing.get_context("spawn")  # Workers never inherit GUI or thread state
+        self.connections = []
+        self.workers = []
+        for zone in range(zone_count):
+            parent_end, child_end = context.Pipe()
+            worker = context.Process(
+                target=_zone_worker, daemon=True,
+                args=(zone, graph.file_path, vertex_map, self.vertex_zones, min_headway,
+                      self.state.name, capacity, child_end))
+            worker.start()
+            child_end.close()
+            self.connections.append(parent_end)
+            self.workers.append(worker)
+
+    @staticmethod
+    def _empty_inbox():
+        return {"spawn": [], "arrivals": [], "messages": [], "tasks": [], "remove": [], "cycles": []}
+
+    def spawn_robot(self, vertex) -> str:
+        """Spawn a robot on a vertex. Returns its ID."""
+        if not self.free_slots:
+            print(f"Error: Fleet is at capacity ({self.state.capacity} robots)")
+            raise ValueError("No free robot slots")
+        self._next_id += 1
+        robot_id = f"R{self._next_id}"
+        zone = self.vertex_zones[vertex]
+        slot = self.free_slots.pop()
+        self.robot_zones[robot_id] = zone
+        self.robot_slots[robot_id] = slot
+        self._inboxes[zone]["spawn"].append((robot_id, vertex, slot))
+        return robot_id
+
+    def assign_task(self, robot_id, destination_vertex):
+        """Queue a navigation task for the next tick"""
+        zone = self.robot_zones.get(robot_id)
+        if zone is not None:
+            self._inboxes[zone]["tasks"].append((robot_id, destination_vertex))
+
+    def remove_robot(self, robot_id):
+        """Queue a robot for removal on the next tick"""
+        zone = self.robot_zones.pop(robot_id, None)
+        if zone is not None:
+            self._inboxes[zone]["remove"].append(robot_id)
+            self._retiring_slots.append(self.robot_slots.pop(robot_id))
+
+    def step(self):
+        """Advance every zone by one tick, in parallel"""
+        for connection, inbox in zip(self.connections, self._inboxes):
+            connection.send(inbox)
+        self._inboxes = [self._empty_inbox() for _ in range(self.zone_count)]
+        retired, self._retiring_slots = self._retiring_slots, []
+        waits: Dict[str, List[str]] = {}
+        for connection in self.connections:
+            reply = connection.recv()
+            self.completed += reply["completed"]
+            for robot_id, holders in reply["waits"].items():
+                waits.setdefault(robot_id, []).extend(holders)
+            for message in reply["messages"]:
+                self._inboxes[message[1]]["messages"].append(message)
+            for zone, robot_state, held, slot in reply["departures"]:
+                self.robot_zones[robot_state[0]] = zone
+                self._inboxes[zone]["arrivals"].append((robot_state, held, slot))
+        self.free_slots.extend(retired)
+        self._share_cycles(waits)
+        self.tick += 1
+
+    def _share_cycles(self, waits):
+        """Hand each wait cycle spanning zones to one of its zones, a different one each check"""
+        for cycle in find_cycles(waits):
+            zones = sorted({self.robot_zones[robot_id] for robot_id in cycle if robot_id in self.robot_zones})
+            if len(zones) > 1:
+                zone = zones[(self.tick // DEADLOCK_CHECK_TICKS) % len(zones)]
+                self._inboxes[zone]["cycles"].append(cycle)
+
+    def robots(self) -> Iterator[Tuple[str, float, float, Optional[str], int]]:
+        """(robot_id, x, y, status, zone) of every robot, read from shared memory"""
+        for robot_id, slot in self.robot_slots.items():
+            values = self.state.read(slot)
+            if values is not None:
+                yield (robot_id, *values)
+
+    def status_counts(self) -> Dict[str, int]:
+        """Number of robots in each status"""
+        counts: Dict[str, int] = {}
+        for robot_id, x, y, status, zone in self.robots():
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def close(self):
+        """Stop the workers and free the shared memory"""
+        for connection in self.connections:
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self.workers:
+            worker.join(timeout=5)
+        for connection in self.connections:
+            connection.close()
+        self.state.close(unlink=True)
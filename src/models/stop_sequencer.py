@@ -0,0 +1,160 @@
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+IMPROVEMENT_EPSILON = 1e-9  # Smallest cost drop that counts as an improvement
+OR_OPT_SEGMENT = 3  # Longest run of consecutive stops an Or-opt move relocates
+EXACT_STOPS = 8  # Up to this many stops the best order is found exactly
+
+
+class StopSequencer:
+    """Orders the stops of a multi-stop task to make the route through them short.
+
+    cost(a, b) gives the travel cost from vertex a to vertex b, e.g. the cached
+    ETA matrix of a TravelTimeModel; it need not be symmetric, and unreachable
+    pairs cost inf. A tour starts at the robot's vertex and ends at its last
+    stop. Up to EXACT_STOPS stops, dynamic programming over subsets of stops
+    finds the cheapest order. For more, nearest insertion builds a first tour,
+    then 2-opt (reverse a run of stops) and Or-opt (move a run of up to
+    OR_OPT_SEGMENT stops) improve it until neither helps or time_budget
+    seconds have passed.
+    """
+
+    def __init__(self, cost: Callable[[int, int], float], time_budget: float = 0.05):
+        self.cost = cost
+        self.time_budget = time_budget
+
+    def sequence(self, start: int, stops: Sequence[int]) -> List[int]:
+        """Visit order of the given stops for a robot at start. Duplicate stops are visited once."""
+        stops = list(dict.fromkeys(stop for stop in stops if stop != start))
+        if len(stops) < 2:
+            return stops
+        matrix = self._matrix([start] + stops)
+        if len(stops) <= EXACT_STOPS:
+            return self._held_karp(start, stops, matrix)
+        deadline = time.perf_counter() + self.time_budget  # The budget is for improving, not for costs
+        tour = self._nearest_insertion(start, stops, matrix)
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = self._two_opt(tour, matrix, deadline) | self._or_opt(tour, matrix, deadline)
+        return tour[1:]
+
+    def tour_cost(self, start: int, stops: Sequence[int]) -> float:
+        """Cost of visiting stops in the given order from start"""
+        tour = [start] + list(stops)
+        return sum(self.cost(a, b) for a, b in zip(tour, tour[1:]))
+
+    def _matrix(self, vertices: List[int]) -> Dict[Tuple[int, int], float]:
+        return {(a, b): self.cost(a, b) for a in vertices for b in vertices if a != b}
+
+    @staticmethod
+    def _held_karp(start, stops, matrix) -> List[int]:
+        """Cheapest visit order, built up over subsets of stops from the cheapest way through each"""
+        count = len(stops)
+        # (subset bitmask, index of the last stop) -> (cost from start through subset, index of the stop before)
+        best: Dict[Tuple[int, int], Tuple[float, Optional[int]]] = {
+            (1 << i, i): (matrix[(start, stop)], None) for i, stop in enumerate(stops)}
+        for subset in range(1, 1 << count):  # Every subset comes after the ones it extends
+            for last in range(count):
+                entry = best.get((subset, last))
+                if entry is None:
+                    continue
+                for following in range(count):
+                    if subset >> following & 1:
+                        continue
+                    key = (subset | 1 << following, following)
+                    cost = entry[0] + matrix[(stops[last], stops[following])]
+                    if key not in best or cost < best[key][0]:
+                        best[key] = (cost, last)
+        subset = (1 << count) - 1
+        last: Optional[int] = min(range(count), key=lambda i: (best[(subset, i)][0], i))
+        order = []
+        while last is not None:
+            order.append(stops[last])
+            previous = best[(subset, last)][1]
+            subset &= ~(1 << last)
+            last = previous
+        return order[::-1]
+
+    @staticmethod
+    def _nearest_insertion(start, stops, matrix) -> List[int]:
+        """Repeatedly take the stop closest to the tour and insert it where it adds least"""
+        tour = [start]
+        remaining = set(stops)
+        order = {stop: index for index, stop in enumerate(stops)}  # Breaks ties the same way every time
+        nearest = {stop: matrix[(start, stop)] for stop in stops}
+        while remaining:
+            stop = min(remaining, key=lambda s: (nearest[s], order[s]))
+            remaining.discard(stop)
+            best_position, best_increase = len(tour), matrix[(tour[-1], stop)]
+            for position in range(1, len(tour)):
+                before, after = tour[position - 1], tour[position]
+                increase = matrix[(before, stop)] + matrix[(stop, after)] - matrix[(before, after)]
+                if increase < best_increase:
+                    best_position, best_increase = position, increase
+            tour.insert(best_position, stop)
+            for other in remaining:
+                nearest[other] = min(nearest[other], matrix[(stop, other)], matrix[(other, stop)])
+        return tour
+
+    @staticmethod
+    def _two_opt(tour, matrix, deadline) -> bool:
+        """Reverse runs of stops while that shortens the tour. The start stays first."""
+        improved_any = False
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            # Running cost of the tour's edges forwards and backwards, as costs may be asymmetric
+            forward, backward = [0.0], [0.0]
+            for a, b in zip(tour, tour[1:]):
+                forward.append(forward[-1] + matrix[(a, b)])
+                backward.append(backward[-1] + matrix[(b, a)])
+            last = len(tour) - 1
+            for i in range(1, last):
+                for j in range(i + 1, last + 1):
+                    before = tour[i - 1]
+                    old = matrix[(before, tour[i])] + forward[j] - forward[i]
+                    new = matrix[(before, tour[j])] + backward[j] - backward[i]
+                    if j < last:
+                        after = tour[j + 1]
+                        old += matrix[(tour[j], after)]
+                        new += matrix[(tour[i], after)]
+                    if new < old - IMPROVEMENT_EPSILON:
+                        tour[i:j + 1] = tour[i:j + 1][::-1]
+                        improved = improved_any = True
+                        break
+                if improved:
+                    break
+        return improved_any
+
+    @staticmethod
+    def _or_opt(tour, matrix, deadline) -> bool:
+        """Move runs of up to OR_OPT_SEGMENT consecutive stops elsewhere while that shortens the tour"""
+        def edge(a, b):
+            return matrix[(a, b)] if b is not None else 0.0
+
+        improved_any = False
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            for length in range(1, OR_OPT_SEGMENT + 1):
+                for i in range(1, len(tour) - length + 1):
+                    first, last = tour[i], tour[i + length - 1]
+                    before = tour[i - 1]
+                    after = tour[i + length] if i + length < len(tour) else None
+                    removed = edge(before, first) + edge(last, after) - edge(before, after)
+                    rest = tour[:i] + tour[i + length:]
+                    for position in range(1, len(rest) + 1):
+                        if position == i:
+                            continue  # Where it came from
+                        left = rest[position - 1]
+                        right = rest[position] if position < len(rest) else None
+                        added = edge(left, first) + edge(last, right) - edge(left, right)
+                        if added < removed - IMPROVEMENT_EPSILON:
+                            tour[:] = rest[:position] + tour[i:i + length] + rest[position:]
+                            improved = improved_any = True
+                            break
+                    if improved:
+                        break
+                if improved:
+                    break
+        return improved_any
@@ -1,67 +1,338 @@
-from typing import Dict, List, Tuple, Set
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, List, Optional, Tuple, Set
+import threading
 import time
 
+COLLISION_HISTORY_LIMIT = 1000  # Most recent waits kept for get_collision_history()
+LOCK_STRIPES = 64  # Locks shared out over lanes and vertices
+CONGESTION_SMOOTHING = 0.2  # Weight of the newest wait in the per-lane and per-vertex delay averages
+
 class TrafficManager:
-    def __init__(self):
-        self.occupied_lanes: Dict[Tuple[int, int], List[str]] = {}  # (start, end) -> [robot_ids]
+    """Arbitrates lanes and vertices between robots.
+
+    A lane may carry several robots in the same direction, in entry order, as
+    long as each keeps min_headway behind the one ahead and the lane's capacity
+    (derived from its length) is not exceeded. A lane is closed to traffic while
+    its reverse direction is occupied. Lanes without a known length carry one
+    robot at a time. A robot may not enter a lane whose far vertex is held by
+    a robot that is not passing through (parked there, or arriving by another
+    lane and maybe about to come the other way), as the two could end up
+    waiting on each other.
+
+    Safe to call from several threads: every lane and vertex maps onto one of
+    LOCK_STRIPES locks (both directions of a lane share one), and operations
+    lock the stripes they touch in index order. acquire() takes a lane and a
+    vertex together or neither. The per-robot wait tables have a lock of their
+    own, taken after any stripes and never held while taking one.
+    """
+
+    def __init__(self, min_headway: float = 30.0):
+        self.min_headway = min_headway  # Minimum following distance, in robot coordinate units
+        self.lane_capacity: Dict[Tuple[int, int], int] = {}  # (start, end) -> max robots
+        self.lane_progress: Dict[str, float] = {}  # robot_id -> distance travelled along its lane
+        self.occupied_lanes: Dict[Tuple[int, int], List[str]] = {}  # (start, end) -> [robot_ids] in entry order
         self.occupied_vertices: Dict[int, str] = {}  # vertex_id -> robot_id
+        self.robot_lanes: Dict[str, Tuple[int, int]] = {}  # robot_id -> lane it is on
         self.waiting_robots: Dict[str, Tuple[int, int]] = {}  # robot_id -> (start_vertex, end_vertex)
-        self.collision_history: List[Tuple[str, str, str, float]] = []  # [(robot_id, location, event_type, timestamp)]
-        
+        # [(robot_id, location, event_type, timestamp)], oldest dropped first
+        self.collision_history: Deque[Tuple[str, str, str, float]] = deque(maxlen=COLLISION_HISTORY_LIMIT)
+        self.listener: Optional[Callable[[str, str, object], None]] = None  # (event_type, robot_id, resource)
+        self.wait_ticks: Dict[str, int] = {}  # robot_id -> requests denied since its last grant
+        self.lane_delays: Dict[Tuple[int, int], float] = {}  # lane -> smoothed denied requests before entry
+        self.vertex_delays: Dict[int, float] = {}  # vertex_id -> smoothed denied requests before entry
+        self._stripes = [threading.RLock() for _ in range(LOCK_STRIPES)]
+        self._wait_lock = threading.Lock()  # Guards waiting_robots and wait_ticks
+
+    def _lane_stripe(self, lane: Tuple[int, int]) -> int:
+        # Both directions share a stripe, entering a lane checks for oncoming traffic
+        return (lane[0] + lane[1]) % LOCK_STRIPES
+
+    def _vertex_stripe(self, vertex_id: int) -> int:
+        return hash(vertex_id) % LOCK_STRIPES
+
+    @contextmanager
+    def _locked(self, *stripes: int):
+        """Hold the given lock stripes, taken in index order so callers cannot deadlock"""
+        ordered = sorted(set(stripes))
+        for stripe in ordered:
+            self._stripes[stripe].acquire()
+        try:
+            yield
+        finally:
+            for stripe in reversed(ordered):
+                self._stripes[stripe].release()
+
+    def _locked_all(self):
+        return self._locked(*range(LOCK_STRIPES))
+
     def request_lane(self, robot_id: str, start_vertex: int, end_vertex: int) -> bool:
         """Request permission to use a lane"""
-        lane = (start_vertex, end_vertex)
-        if lane in self.occupied_lanes:
-            # Lane is occupied, add to waiting list
-            self.waiting_robots[robot_id] = lane
-            return False
-        else:
-            # Lane is free, mark as occupied
-            self.occupied_lanes[lane] = [robot_id]
-            return True
-            
+        return self.acquire(robot_id, lane=(start_vertex, end_vertex))
+
     def request_vertex(self, robot_id: str, vertex_id: int) -> bool:
         """Request permission to occupy a vertex"""
-        if vertex_id in self.occupied_vertices:
-            # Vertex is occupied, add to waiting list
-            self.waiting_robots[robot_id] = (vertex_id, vertex_id)
+        return self.acquire(robot_id, vertex_id=vertex_id)
+
+    def acquire(self, robot_id: str, lane: Optional[Tuple[int, int]] = None,
+                vertex_id: Optional[int] = None) -> bool:
+        """Take a lane and/or a vertex atomically: either both are granted or neither is"""
+        if lane is not None and robot_id in self.occupied_lanes.get(lane, ()):
+            lane = None  # Already held, and only the holder gives its resources back
+        if vertex_id is not None and self.occupied_vertices.get(vertex_id) == robot_id:
+            vertex_id = None
+        if lane is None and vertex_id is None:
+            return True
+        # Deny without locking when the answer is plainly no; grants are only made under the locks
+        blocked_on = self._blocked_on(lane, vertex_id, robot_id)
+        if blocked_on is None:
+            if lane is not None and vertex_id is not None:
+                with self._locked(self._lane_stripe(lane), self._vertex_stripe(vertex_id)):
+                    blocked_on = self._grant(robot_id, lane, vertex_id)
+            else:
+                stripe = self._lane_stripe(lane) if lane is not None else self._vertex_stripe(vertex_id)
+                with self._stripes[stripe]:
+                    blocked_on = self._grant(robot_id, lane, vertex_id)
+        if blocked_on is not None:
+            self._wait(robot_id, blocked_on)
             return False
-        else:
-            # Vertex is free, mark as occupied
+        return True
+
+    def _wait(self, robot_id: str, location: Tuple[int, int]):
+        """Record a denied request, blocked on location"""
+        with self._wait_lock:
+            self.waiting_robots[robot_id] = location
+            # Blocked robots retry once per tick, so this counts the ticks spent waiting
+            self.wait_ticks[robot_id] = self.wait_ticks.get(robot_id, 0) + 1
+
+    def _blocked_on(self, lane: Optional[Tuple[int, int]], vertex_id: Optional[int],
+                    robot_id: Optional[str] = None) -> Optional[Tuple[int, int]]:
+        """What stops the lane and vertex from being granted, as a waiting location, or None"""
+        if lane is not None and not self._can_enter_lane(lane):
+            return lane  # Lane is full, oncoming or the last robot is too close
+        if lane is not None and vertex_id is None and not self._far_vertex_clear(robot_id, lane):
+            return (lane[1], lane[1])  # Wait for the robot at the far end to move off
+        if vertex_id is not None and vertex_id in self.occupied_vertices:
+            return (vertex_id, vertex_id)  # Vertex is occupied
+        return None
+
+    def _grant(self, robot_id: str, lane: Optional[Tuple[int, int]], vertex_id: Optional[int]):
+        """Check again and grant, with the stripes of the lane and vertex held. Returns what blocked it, if anything."""
+        blocked_on = self._blocked_on(lane, vertex_id, robot_id)
+        if blocked_on is not None:
+            return blocked_on
+        waited = self._stop_waiting(robot_id)
+        if lane is not None:
+            # Join the lane behind any robots already on it
+            lane = (lane[0], lane[1])
+            self.occupied_lanes.setdefault(lane, []).append(robot_id)
+            self.lane_progress[robot_id] = 0.0
+            self.robot_lanes[robot_id] = lane
+            self._observe_delay(self.lane_delays, lane, waited)
+            self._notify("lane_grant", robot_id, lane)
+        if vertex_id is not None:
             self.occupied_vertices[vertex_id] = robot_id
+            self._observe_delay(self.vertex_delays, vertex_id, waited)
+            self._notify("vertex_grant", robot_id, vertex_id)
+        return None
+
+    def _stop_waiting(self, robot_id: str) -> int:
+        """Drop a robot from the wait tables. Returns the ticks it had waited."""
+        with self._wait_lock:
+            self.waiting_robots.pop(robot_id, None)
+            return self.wait_ticks.pop(robot_id, 0)
+
+    @staticmethod
+    def _observe_delay(delays, key, waited):
+        """Fold one entry's wait into a smoothed average; free-flowing entries pull it back down"""
+        previous = delays.get(key)
+        if previous is None:
+            if waited:
+                delays[key] = float(waited)
+            return
+        delays[key] = previous + CONGESTION_SMOOTHING * (waited - previous)
+
+    def can_acquire(self, lane: Optional[Tuple[int, int]] = None, vertex_id: Optional[int] = None,
+                    robot_id: Optional[str] = None) -> bool:
+        """Whether a lane and/or vertex would be granted right now, without taking them"""
+        return self._blocked_on(lane, vertex_id, robot_id) is None
+
+    def withdraw(self, robot_id: str):
+        """Forget a robot's pending request, e.g. when it stops waiting and goes another way"""
+        self._stop_waiting(robot_id)
+
+    def turn_back(self, robot_id: str, lane: Tuple[int, int]) -> bool:
+        """Turn a robot around on a lane it has to itself, so it can back out of a deadlock"""
+        reverse = (lane[1], lane[0])
+        with self._stripes[self._lane_stripe(lane)]:  # Shared by both directions
+            if self.occupied_lanes.get(lane) != [robot_id]:
+                return False
+            del self.occupied_lanes[lane]
+            self.occupied_lanes[reverse] = [robot_id]
+            self.lane_progress[robot_id] = 0.0
+            self.robot_lanes[robot_id] = reverse
+        self.withdraw(robot_id)
+        self._notify("lane_release", robot_id, lane)
+        self._notify("lane_grant", robot_id, reverse)
+        return True
+
+    def waits_for(self, robot_id: str) -> List[str]:
+        """Robots holding what a waiting robot is blocked on"""
+        location = self.waiting_robots.get(robot_id)
+        if location is None:
+            return []
+        return self._holders(robot_id, location)
+
+    def wait_reason(self, robot_id: str) -> Optional[str]:
+        """Why a robot is waiting, from what its last request was blocked on"""
+        location = self.waiting_robots.get(robot_id)
+        if location is None:
+            return None
+        if location[0] == location[1]:
+            return f"Vertex {location[0]} is occupied"
+        return f"Lane {location} is occupied"
+
+    def blockers(self, robot_id: str, lane: Tuple[int, int]) -> List[str]:
+        """Robots keeping a robot from entering a lane right now"""
+        location = self._blocked_on(lane, None, robot_id)
+        if location is None:
+            return []
+        return self._holders(robot_id, location)
+
+    def _holders(self, robot_id: str, location: Tuple[int, int]) -> List[str]:
+        start, end = location
+        if start == end:
+            holder = self.occupied_vertices.get(start)
+            holders = [holder] if holder is not None else []
+        else:
+            # Oncoming traffic, or the robots filling the lane
+            holders = self.occupied_lanes.get((end, start)) or self.occupied_lanes.get(location, [])
+        return [holder for holder in holders if holder != robot_id]
+
+    def wait_edges(self) -> Dict[str, List[str]]:
+        """robot_id -> robots holding what it waits on, including followers waiting on the robot ahead"""
+        with self._locked_all():
+            with self._wait_lock:
+                waiting = list(self.waiting_robots)
+            waits = {robot_id: self.waits_for(robot_id) for robot_id in waiting}
+            for robot_ids in self.occupied_lanes.values():
+                # A robot following another down a lane cannot get past it
+                for ahead, follower in zip(robot_ids, robot_ids[1:]):
+                    waits.setdefault(follower, [ahead])
+        return waits
+
+    def find_wait_cycles(self) -> List[List[str]]:
+        """Groups of waiting robots that each wait on the next one round.
+
+        None of them can move until one gives way, as every resource they are
+        blocked on is held by another robot of the group. A robot following
+        another down a lane waits on the one ahead.
+        """
+        return find_cycles(self.wait_edges())
+
+    def observed_delays(self) -> Tuple[Dict[Tuple[int, int], float], Dict[int, float]]:
+        """Smoothed ticks robots wait to enter each lane and vertex, from recent grants"""
+        return dict(self.lane_delays), dict(self.vertex_delays)
+            
+    def _can_enter_lane(self, lane: Tuple[int, int]) -> bool:
+        """Check direction, capacity and headway for a robot entering a lane"""
+        if (lane[1], lane[0]) in self.occupied_lanes:
+            return False  # Oncoming traffic
+        robot_ids = self.occupied_lanes.get(lane)
+        if not robot_ids:
             return True
+        if len(robot_ids) >= self.lane_capacity.get(lane, 1):
+            return False
+        # The last robot to enter must be a full headway down the lane
+        return self.lane_progress.get(robot_ids[-1], 0.0) >= self.min_headway
+
+    def _far_vertex_clear(self, robot_id: Optional[str], lane: Tuple[int, int]) -> bool:
+        """Check that the vertex at the end of a lane is free, or held by a robot passing through"""
+        holder = self.occupied_vertices.get(lane[1])
+        if holder is None or holder == robot_id:
+            return True
+        # Ahead of us on this lane, or already leaving the vertex by another lane
+        holder_lane = self.robot_lanes.get(holder)
+        return holder_lane is not None and (holder_lane == lane or holder_lane[0] == lane[1])
+
+    def set_lane_lengths(self, lane_lengths: Dict[Tuple[int, int], float]):
+        """Derive per-lane capacity from lane lengths"""
+        self.lane_capacity = {
+            lane: max(1, int(length // self.min_headway)) if self.min_headway > 0 else 1
+            for lane, length in lane_lengths.items()
+        }
+
+    def update_lane_progress(self, robot_id: str, progress: float):
+        """Record how far a robot has travelled along the lane it holds"""
+        if robot_id in self.lane_progress:
+            self.lane_progress[robot_id] = progress
+
+    def get_headway_limit(self, robot_id: str, lane: Tuple[int, int]) -> float:
+        """How far a robot may move along its lane without closing in on the robot ahead"""
+        with self._stripes[self._lane_stripe(lane)]:
+            robot_ids = self.occupied_lanes.get(lane, ())
+            if robot_id not in robot_ids:
+                return float('inf')
+            index = robot_ids.index(robot_id)
+            if index == 0:
+                return float('inf')
+            leader_progress = self.lane_progress.get(robot_ids[index - 1], 0.0)
+        return leader_progress - self.min_headway - self.lane_progress.get(robot_id, 0.0)
             
     def release_lane(self, robot_id: str, start_vertex: int, end_vertex: int):
         """Release a lane after robot has passed through"""
         lane = (start_vertex, end_vertex)
-        if lane in self.occupied_lanes:
-            if robot_id in self.occupied_lanes[lane]:
+        with self._stripes[self._lane_stripe(lane)]:
+            if robot_id in self.occupied_lanes.get(lane, ()):
                 self.occupied_lanes[lane].remove(robot_id)
+                self.lane_progress.pop(robot_id, None)
+                if self.robot_lanes.get(robot_id) == lane:
+                    del self.robot_lanes[robot_id]
                 if not self.occupied_lanes[lane]:
                     del self.occupied_lanes[lane]
+                self._notify("lane_release", robot_id, lane)
                     
     def release_vertex(self, robot_id: str, vertex_id: int):
         """Release a vertex after robot has left"""
-        if vertex_id in self.occupied_vertices and self.occupied_vertices[vertex_id] == robot_id:
-            del self.occupied_vertices[vertex_id]
+        with self._stripes[self._vertex_stripe(vertex_id)]:
+            if self.occupied_vertices.get(vertex_id) == robot_id:
+                del self.occupied_vertices[vertex_id]
+                self._notify("vertex_release", robot_id, vertex_id)
             
+    def release_all(self, robot_id: str):
+        """Release every lane and vertex held by a robot, e.g. when it is removed"""
+        for lane, robot_ids in list(self.occupied_lanes.items()):
+            if robot_id in robot_ids:
+                self.release_lane(robot_id, lane[0], lane[1])
+        for vertex_id, holder in list(self.occupied_vertices.items()):
+            if holder == robot_id:
+                self.release_vertex(robot_id, vertex_id)
+        self._stop_waiting(robot_id)
+
+    def _notify(self, event_type: str, robot_id: str, resource):
+        """Report an occupancy change to the listener, if any"""
+        if self.listener is not None:
+            self.listener(event_type, robot_id, resource)
+
     def check_waiting_robots(self) -> List[str]:
         """Check if any waiting robots can proceed"""
         can_proceed = []
-        for robot_id, lane in list(self.waiting_robots.items()):
-            if lane not in self.occupied_lanes:
-                can_proceed.append(robot_id)
-                del self.waiting_robots[robot_id]
+        with self._wait_lock:
+            for robot_id, lane in list(self.waiting_robots.items()):
+                if lane not in self.occupied_lanes:
+                    can_proceed.append(robot_id)
+                    del self.waiting_robots[robot_id]
         return can_proceed
         
     def log_collision(self, robot_id: str, location: str, event_type: str):
-        """Log a collision or waiting event"""
+        """Log a collision or waiting event and report it to the listener"""
         timestamp = time.time()
         self.collision_history.append((robot_id, location, event_type, timestamp))
+        self._notify("wait", robot_id, location)
         
     def get_collision_history(self) -> List[Tuple[str, str, str, float]]:
-        """Get the collision history"""
-        return self.collision_history
+        """Get the recent collision history"""
+        return list(self.collision_history)
         
     def get_waiting_robots(self) -> Dict[str, Tuple[int, int]]:
         """Get the list of waiting robots and their waiting locations"""
@@ -73,4 +344,51 @@ class TrafficManager:
         
     def get_occupied_vertices(self) -> Dict[int, str]:
         """Get the list of occupied vertices"""
-        return self.occupied_vertices 
\ No newline at end of file
+        return self.occupied_vertices
+
+    def get_state(self) -> Dict[str, object]:
+        """Get a consistent copy of the occupancy tables for snapshotting"""
+        with self._locked_all(), self._wait_lock:
+            return {
+                'lane_progress': dict(self.lane_progress),
+                'occupied_lanes': {lane: list(ids) for lane, ids in self.occupied_lanes.items()},
+                'occupied_vertices': dict(self.occupied_vertices),
+                'waiting_robots': dict(self.waiting_robots),
+                'wait_ticks': dict(self.wait_ticks),
+            }
+
+    def load_state(self, state: Dict[str, object]):
+        """Replace the occupancy tables with a state produced by get_state()"""
+        with self._locked_all():
+            self.occupied_lanes = {tuple(lane): list(ids) for lane, ids in state['occupied_lanes'].items()}
+            self.occupied_vertices = dict(state['occupied_vertices'])
+            with self._wait_lock:
+                self.waiting_robots = {robot_id: tuple(loc) for robot_id, loc in state['waiting_robots'].items()}
+                self.wait_ticks = dict(state.get('wait_ticks', {}))
+            self.lane_progress = dict(state.get('lane_progress', {}))
+            self.robot_lanes = {robot_id: lane for lane, ids in self.occupied_lanes.items() for robot_id in ids}
+
+
+def find_cycles(waits: Dict[str, List[str]]) -> List[List[str]]:
+    """Cycles in a wait-for graph of robot_id -> robots it waits on"""
+    cycles = []
+    done = set()
+    for root in sorted(waits):
+        if root in done:
+            continue
+        stack = [(root, iter(waits[root]))]
+        depth = {root: 0}  # Robots on the current search path -> position in stack
+        while stack:
+            robot_id, blockers = stack[-1]
+            for blocker in blockers:
+                if blocker in depth:
+                    cycles.append([entry[0] for entry in stack[depth[blocker]:]])
+                elif blocker in waits and blocker not in done:
+                    depth[blocker] = len(stack)
+                    stack.append((blocker, iter(waits[blocker])))
+                    break
+            else:
+                stack.pop()
+                del depth[robot_id]
+                done.add(robot_id)
+    return cycles
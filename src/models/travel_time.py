@@ -0,0 +1,158 @@
+import heapq
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+CONGESTION_TOLERANCE = 0.5  # Ticks an observed delay may drift before cached ETAs are recomputed
+
+
+class TravelTimeModel:
+    """Estimated travel times, in ticks, over a NavGraph.
+
+    A lane takes its length over the robot speed, capped by the lane's
+    speed_limit, plus the congestion delay last observed for entering the lane
+    and its end vertex. Turning at a vertex costs turn_penalty ticks for a full
+    reversal, scaled by the turn angle, and a route pays once for accelerating
+    from and braking to a stop. Lengths and speeds are in the simulation's frame;
+    limit_scale converts a graph speed_limit into frame units per tick.
+
+    eta() answers from a vertex-to-vertex matrix whose rows are computed on first
+    use (precompute() fills them all) and dropped when congestion or closed lanes change.
+    """
+
+    def __init__(self, graph, lane_lengths=None, speed=2.0, acceleration=None, turn_penalty=0.0,
+                 limit_scale=1.0):
+        self.graph = graph
+        self.speed = speed
+        self.acceleration = acceleration
+        self.turn_penalty = turn_penalty
+        self.limit_scale = limit_scale
+        self.lane_delays: Dict[Tuple[int, int], float] = {}
+        self.vertex_delays: Dict[int, float] = {}
+        self._lane_lengths = lane_lengths or {lane: graph.lane_length(*lane) for lane in graph.lanes}
+        self._rows: Dict[int, List[float]] = {}
+        self._lane_times: Dict[Tuple[int, int], float] = {}  # Memo of lane_time(), dropped with the rows
+        self._closed_lanes = frozenset(graph.closed_lanes)
+
+    def stop_overhead(self) -> float:
+        """Ticks lost accelerating from rest and braking back to it, compared with cruising"""
+        return self.speed / self.acceleration if self.acceleration else 0.0
+
+    def lane_time(self, start_vertex, end_vertex) -> float:
+        """Ticks to drive a lane, including its observed congestion delay"""
+        time = self._lane_times.get((start_vertex, end_vertex))
+        if time is None:
+            time = self._lane_times[(start_vertex, end_vertex)] = self._compute_lane_time(start_vertex, end_vertex)
+        return time
+
+    def _compute_lane_time(self, start_vertex, end_vertex) -> float:
+        length = self._lane_lengths.get((start_vertex, end_vertex))
+        if length is None:
+            length = self._lane_lengths.get((end_vertex, start_vertex), 0.0)
+        speed = self.speed
+        limit = self.graph.speed_limit(start_vertex, end_vertex)
+        if limit:
+            speed = min(speed, limit * self.limit_scale)
+        return (length / speed + self.lane_delays.get((start_vertex, end_vertex), 0.0)
+                + self.vertex_delays.get(end_vertex, 0.0))
+
+    def turn_time(self, previous_vertex, vertex, next_vertex) -> float:
+        """Ticks lost changing heading at a vertex"""
+        if not self.turn_penalty or previous_vertex is None:
+            return 0.0
+        (x0, y0, _), (x1, y1, _), (x2, y2, _) = (self.graph.vertices[previous_vertex],
+                                                 self.graph.vertices[vertex],
+                                                 self.graph.vertices[next_vertex])
+        angle = abs(math.atan2(y2 - y1, x2 - x1) - math.atan2(y1 - y0, x1 - x0)) % (2 * math.pi)
+        return self.turn_penalty * min(angle, 2 * math.pi - angle) / math.pi
+
+    def route_time(self, vertex_path: Sequence[int]) -> float:
+        """Ticks to drive a given route from standstill to standstill"""
+        if len(vertex_path) < 2:
+            return 0.0
+        total = self.stop_overhead()
+        previous = None
+        for start, end in zip(vertex_path, vertex_path[1:]):
+            total += self.turn_time(previous, start, end) + self.lane_time(start, end)
+            previous = start
+        return total
+
+    def eta(self, source, target) -> float:
+        """Ticks from source to target by the fastest route, or inf if there is none"""
+        if source == target:
+            return 0.0
+        time = self._row(source)[target]
+        return time + self.stop_overhead() if time != float('inf') else time
+
+    def precompute(self) -> List[List[float]]:
+        """Fill and return the whole vertex-to-vertex ETA matrix"""
+        return [[self.eta(source, target) for target in range(len(self.graph.vertices))]
+                for source in range(len(self.graph.vertices))]
+
+    def _row(self, source) -> List[float]:
+        if self._closed_lanes != self.graph.closed_lanes:
+            self._closed_lanes = frozenset(self.graph.closed_lanes)
+            self._rows = {}
+        row = self._rows.get(source)
+        if row is None:
+            row = self._rows[source] = self._fastest_times(source)
+        return row
+
+    def _fastest_times(self, source) -> List[float]:
+        """Dijkstra over (vertex, arrived-from) states, so turn costs depend on the way in"""
+        if not self.turn_penalty:
+            return self._fastest_times_without_turns(source)
+        closed = self.graph.closed_lanes
+        best = [float('inf')] * len(self.graph.vertices)
+        dist: Dict[Tuple[int, Optional[int]], float] = {(source, None): 0.0}
+        heap: List[Tuple[float, int, int]] = [(0.0, source, -1)]
+        while heap:
+            time, vertex, previous = heapq.heappop(heap)
+            previous = None if previous < 0 else previous
+            if time > dist.get((vertex, previous), float('inf')):
+                continue
+            if time < best[vertex]:
+                best[vertex] = time
+            for neighbor in self.graph.adjacency_list[vertex]:
+                if (vertex, neighbor) in closed:
+                    continue
+                new_time = time + self.turn_time(previous, vertex, neighbor) + self.lane_time(vertex, neighbor)
+                if new_time < dist.get((neighbor, vertex), float('inf')):
+                    dist[(neighbor, vertex)] = new_time
+                    heapq.heappush(heap, (new_time, neighbor, vertex))
+        return best
+
+    def _fastest_times_without_turns(self, source) -> List[float]:
+        """Plain Dijkstra over vertices, enough when turning is free"""
+        closed = self.graph.closed_lanes
+        best = [float('inf')] * len(self.graph.vertices)
+        best[source] = 0.0
+        heap: List[Tuple[float, int]] = [(0.0, source)]
+        while heap:
+            time, vertex = heapq.heappop(heap)
+            if time > best[vertex]:
+                continue
+            for neighbor in self.graph.adjacency_list[vertex]:
+                if (vertex, neighbor) in closed:
+                    continue
+                new_time = time + self.lane_time(vertex, neighbor)
+                if new_time < best[neighbor]:
+                    best[neighbor] = new_time
+                    heapq.heappush(heap, (new_time, neighbor))
+        return best
+
+    def set_congestion(self, lane_delays, vertex_delays) -> bool:
+        """Replace the congestion delays. Cached ETAs are dropped only if a delay moved noticeably."""
+        changed = any(abs(lane_delays.get(key, 0.0) - self.lane_delays.get(key, 0.0)) > CONGESTION_TOLERANCE
+                      for key in set(lane_delays) | set(self.lane_delays)) or \
+            any(abs(vertex_delays.get(key, 0.0) - self.vertex_delays.get(key, 0.0)) > CONGESTION_TOLERANCE
+                for key in set(vertex_delays) | set(self.vertex_delays))
+        if changed:
+            self.lane_delays = dict(lane_delays)
+            self.vertex_delays = dict(vertex_delays)
+            self._rows = {}
+            self._lane_times = {}
+        return changed
+
+    def refresh_congestion(self, traffic_manager) -> bool:
+        """Pull the delays the traffic manager has observed"""
+        return self.set_congestion(*traffic_manager.observed_delays())
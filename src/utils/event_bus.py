@@ -0,0 +1,125 @@
+from typing import Callable, Dict, Hashable, List, NamedTuple, Optional, Sequence, Type
+
+
+class RobotSpawned(NamedTuple):
+    tick: int
+    robot_id: str
+    vertex: int
+
+
+class RobotRemoved(NamedTuple):
+    tick: int
+    robot_id: str
+    reason: str  # "removed" or "reclaimed"
+
+
+class TaskAssigned(NamedTuple):
+    tick: int
+    robot_id: str
+    destination: int
+
+
+class TaskRejected(NamedTuple):
+    tick: int
+    robot_id: str
+    destination: int
+
+
+class StatusChanged(NamedTuple):
+    tick: int
+    robot_id: str
+    old_status: str
+    new_status: str
+    reason: Optional[str]
+
+
+class TaskCompleted(NamedTuple):
+    tick: int
+    robot_id: str
+    source_vertex: Optional[int]
+    destination_vertex: Optional[int]
+    path_length: int
+
+
+class TrafficWait(NamedTuple):
+    """A robot held up at a lane or vertex. Repeats for the same spot coalesce into one, counted."""
+    tick: int
+    robot_id: str
+    location: str
+    count: int = 1
+
+    def coalesce_key(self) -> Hashable:
+        return (self.robot_id, self.location)
+
+
+class _Subscription:
+    """One subscriber: the event types it wants, how often it runs and its pending batch"""
+
+    def __init__(self, handler, event_types, every):
+        self.handler = handler
+        self.event_types = event_types
+        self.every = max(1, every)
+        self.pending: List[NamedTuple] = []
+        self.positions: Dict[Hashable, int] = {}  # coalesce key -> index in pending
+
+    def add(self, event):
+        coalesce_key = getattr(event, "coalesce_key", None)
+        if coalesce_key is None:
+            self.pending.append(event)
+            return
+        key = (type(event), coalesce_key())
+        index = self.positions.get(key)
+        if index is None:
+            self.positions[key] = len(self.pending)
+            self.pending.append(event)
+        else:
+            # Keep the first position, the latest tick and the running count
+            previous = self.pending[index]
+            self.pending[index] = event._replace(count=previous.count + event.count)
+
+    def take(self) -> List[NamedTuple]:
+        batch = self.pending
+        self.pending = []
+        self.positions = {}
+        return batch
+
+
+class EventBus:
+    """Typed publish/subscribe between the simulation core and its consumers.
+
+    publish() only routes the event into the pending batch of each subscriber
+    that wants its type, so publishing with nobody listening is a dict lookup.
+    flush() runs once per tick and hands each subscriber its batch when its
+    cadence comes up, with repeated events (such as a robot still waiting at
+    the same spot) coalesced.
+    """
+
+    def __init__(self):
+        self._routes: Dict[Type, List[_Subscription]] = {}
+        self._subscriptions: List[_Subscription] = []
+
+    def subscribe(self, handler: Callable[[List[NamedTuple]], None],
+                  event_types: Sequence[Type], every: int = 1) -> _Subscription:
+        """Call handler with a batch of the given event types every `every` ticks"""
+        subscription = _Subscription(handler, tuple(event_types), every)
+        self._subscriptions.append(subscription)
+        for event_type in subscription.event_types:
+            self._routes.setdefault(event_type, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: _Subscription):
+        """Stop delivering events to a subscriber"""
+        self._subscriptions.remove(subscription)
+        for event_type in subscription.event_types:
+            self._routes[event_type].remove(subscription)
+
+    def publish(self, event):
+        """Queue an event for every subscriber of its type"""
+        for subscription in self._routes.get(type(event), ()):
+            subscription.add(event)
+
+    def flush(self, tick: int, force: bool = False):
+        """Deliver pending batches to subscribers whose cadence falls on this tick"""
+        for subscription in self._subscriptions:
+            if subscription.pending and (force or tick % subscription.every == 0):
+                subscription.handler(subscription.take())
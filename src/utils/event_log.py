@@ -0,0 +1,128 @@
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List
+
+from src.models.fleet_simulation import FleetSimulation
+from src.models.robot import Robot
+from src.utils.snapshot import list_snapshot_history, load_snapshot
+
+
+class EventLog:
+    """Append-only structured log of simulation events, one JSON object per line.
+
+    Command events (spawn, task, stops, remove) are the inputs that drive the simulation
+    and are what a replay re-applies. Grants, releases and status changes are
+    derived from them and are kept for analysis.
+    """
+
+    COMMAND_EVENTS = ("spawn", "task", "stops", "remove")
+
+    def __init__(self, file_path=None):
+        self.file_path = file_path
+        self.events: List[Dict] = []  # Only used when there is no file
+        self._file = open(file_path, "a") if file_path else None
+
+    @classmethod
+    def for_session(cls, log_dir="logs", timestamp=None):
+        """Create a log file for a new session next to the movement logs"""
+        log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), log_dir)
+        os.makedirs(log_dir, exist_ok=True)
+        timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+        return cls(os.path.join(log_dir, f"events_{timestamp}.jsonl"))
+
+    def record(self, tick, event_type, **data):
+        """Append an event"""
+        event = {"tick": tick, "type": event_type}
+        event.update(data)
+        if self._file is not None:
+            self._file.write(json.dumps(event, separators=(",", ":")) + "\n")
+        else:
+            self.events.append(event)
+
+    def flush(self):
+        """Flush buffered events to disk"""
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        """Flush and close the log file"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __iter__(self) -> Iterator[Dict]:
+        if self.file_path:
+            self.flush()
+            return read_events(self.file_path)
+        return iter(self.events)
+
+
+def read_events(file_path) -> Iterator[Dict]:
+    """Read events back from a log file"""
+    with open(file_path, "r") as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                event = json.loads(line)
+                if isinstance(event.get("resource"), list):
+                    event["resource"] = tuple(event["resource"])
+                yield event
+
+
+class ReplayEngine:
+    """Rebuilds the fleet at any tick from snapshots plus the recorded commands.
+
+    state_at() seeks to the newest snapshot at or before the requested tick and
+    re-runs the deterministic tick loop from there, re-issuing recorded commands
+    at the tick they happened. No timers are involved, so a replay runs as fast
+    as the simulation can step.
+    """
+
+    def __init__(self, graph, events: Iterable[Dict], snapshot_history=None, vertex_map=None):
+        self.graph = graph
+        self.idle_ttl = None
+        self.snapshot_history = list(snapshot_history or [])  # [(tick, path)], oldest first
+        self.commands: Dict[int, List[Dict]] = {}
+        self.last_tick = 0
+        for event in events:
+            self.last_tick = max(self.last_tick, event["tick"])
+            if event["type"] == "start":
+                self.idle_ttl = event.get("idle_ttl")
+                if vertex_map is None:
+                    vertex_map = {i: tuple(point) for i, point in enumerate(event["vertex_map"])}
+            elif event["type"] in EventLog.COMMAND_EVENTS:
+                self.commands.setdefault(event["tick"], []).append(event)
+        self.vertex_map = vertex_map
+
+    @classmethod
+    def from_files(cls, graph, events_path, history_dir=None, vertex_map=None):
+        """Build an engine from an event log file and an optional snapshot history directory"""
+        history = list_snapshot_history(history_dir) if history_dir else []
+        return cls(graph, read_events(events_path), history, vertex_map)
+
+    def nearest_snapshot(self, tick):
+        """Load the newest snapshot taken at or before the tick, or None"""
+        best = None
+        for snapshot_tick, path in self.snapshot_history:
+            if snapshot_tick > tick:
+                break
+            best = path
+        return load_snapshot(best) if best else None
+
+    def state_at(self, tick):
+        """Get a FleetSimulation as it was at the given tick"""
+        saved_count = Robot.robot_count
+        try:
+            simulation = FleetSimulation(self.graph, vertex_map=self.vertex_map, idle_ttl=self.idle_ttl)
+            snapshot = self.nearest_snapshot(tick)
+            if snapshot is not None:
+                simulation.restore_snapshot(snapshot)
+            while True:
+                for event in self.commands.get(simulation.tick, ()):
+                    simulation.apply_event(event)
+                if simulation.tick >= tick:
+                    return simulation
+                simulation.step()
+        finally:
+            Robot.robot_count = saved_count
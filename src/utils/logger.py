@@ -1,19 +1,34 @@
 import os
-import logging
 from datetime import datetime
 import time
 
+from src.utils.event_bus import RobotSpawned, StatusChanged, TaskAssigned, TaskCompleted, TrafficWait
+
 class RobotLogger:
     def __init__(self, log_dir="logs"):
-        # Create logs directory if it doesn't exist
+        # The directory, log file and logging handlers are created on first write,
+        # so constructing a logger costs nothing for runs that never log
         self.log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), log_dir)
-        os.makedirs(self.log_dir, exist_ok=True)
         
         # Create a new log file for each session
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         self.log_file = os.path.join(self.log_dir, f"robot_movements_{timestamp}.log")
+        self._logger = None
         
-        # Configure logging
+        self.start_time = time.time()
+
+    @property
+    def logger(self):
+        """Logger for this session, configured on first use"""
+        if self._logger is None:
+            self._setup()
+        return self._logger
+
+    def _setup(self):
+        """Create the logs directory and configure logging"""
+        import logging
+
+        os.makedirs(self.log_dir, exist_ok=True)
         logging.basicConfig(
             level=logging.INFO,
             format='%(asctime)s - %(message)s',
@@ -22,9 +37,7 @@ class RobotLogger:
                 logging.StreamHandler()  # Also print to console
             ]
         )
-        self.logger = logging.getLogger("RobotLogger")
-        
-        self.start_time = time.time()
+        self._logger = logging.getLogger("RobotLogger")
 
     def _get_timestamp(self):
         """Get current timestamp in a readable format"""
@@ -32,8 +45,40 @@ class RobotLogger:
         
     def _write_log(self, message):
         """Write a log message to the file"""
+        self._write_logs([message])
+
+    def _write_logs(self, messages):
+        """Write several log messages with a single file open"""
+        if self._logger is None:
+            self._setup()
+        timestamp = self._get_timestamp()
         with open(self.log_file, "a") as f:
-            f.write(f"[{self._get_timestamp()}] {message}\n")
+            f.writelines(f"[{timestamp}] {message}\n" for message in messages)
+
+    def log_fleet_events(self, events, vertex_names):
+        """Log a batch of simulation events from the event bus"""
+        def name(vertex):
+            return vertex_names[vertex] if vertex is not None else "Unknown"
+
+        messages = []
+        for event in events:
+            if isinstance(event, RobotSpawned):
+                messages.append(f"Robot {event.robot_id} spawned at {name(event.vertex)}")
+            elif isinstance(event, TaskAssigned):
+                messages.append(f"Task assigned to Robot {event.robot_id}: navigate to {name(event.destination)}")
+            elif isinstance(event, StatusChanged):
+                message = f"Robot {event.robot_id} status changed from {event.old_status} to {event.new_status}"
+                if event.reason:
+                    message += f" (Reason: {event.reason})"
+                messages.append(message)
+            elif isinstance(event, TaskCompleted):
+                messages.append(f"Robot {event.robot_id} completed journey from {name(event.source_vertex)} "
+                                f"to {name(event.destination_vertex)} (Path Length: {event.path_length})")
+            elif isinstance(event, TrafficWait):
+                repeats = f" ({event.count} times)" if event.count > 1 else ""
+                messages.append(f"TRAFFIC: Robot {event.robot_id} WAITING at {event.location}{repeats}")
+        if messages:
+            self._write_logs(messages)
             
     def log_robot_spawn(self, robot_id, location):
         """Log when a robot is spawned"""
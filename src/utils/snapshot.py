@@ -0,0 +1,188 @@
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from typing import List, Optional, Tuple
+
+from src.models.robot import Robot
+from src.models.traffic_manager import TrafficManager
+
+SNAPSHOT_MAGIC = b"FLTS"
+SNAPSHOT_VERSION = 3
+# magic, version, created_at, payload length
+_HEADER = struct.Struct("<4sHdI")
+
+
+class FleetSnapshot:
+    """Point-in-time copy of the fleet: robots, traffic occupancy and the robot ID counter"""
+
+    def __init__(self, robot_states, traffic_state, robot_count, graph_signature=None,
+                 tick=0, created_at=None, robot_fields=Robot.STATE_FIELDS, gave_way_at=None):
+        self.robot_states = robot_states
+        self.robot_fields = robot_fields
+        self.traffic_state = traffic_state
+        self.robot_count = robot_count
+        self.graph_signature = graph_signature
+        self.tick = tick
+        self.created_at = created_at if created_at is not None else time.time()
+        self.gave_way_at = gave_way_at if gave_way_at is not None else {}  # robot_id -> tick it last gave way
+
+    @classmethod
+    def capture(cls, robots, traffic_manager: TrafficManager, graph=None, tick=0, gave_way_at=None):
+        """Copy the live fleet state. Cheap enough to call from the main loop."""
+        return cls(
+            robot_states=[robot.get_state() for robot in robots],
+            traffic_state=traffic_manager.get_state(),
+            robot_count=Robot.robot_count,
+            graph_signature=graph_signature(graph) if graph is not None else None,
+            tick=tick,
+            gave_way_at=dict(gave_way_at or {}),
+        )
+
+    def restore(self, traffic_manager: Optional[TrafficManager] = None) -> Tuple[List[Robot], TrafficManager]:
+        """Rebuild robots and load the occupancy tables into a (new or given) traffic manager,
+        and resume the robot ID counter"""
+        robots = [Robot.from_state(state, self.robot_fields) for state in self.robot_states]
+        traffic_manager = traffic_manager or TrafficManager()
+        traffic_manager.load_state(self.traffic_state)
+        Robot.robot_count = max(Robot.robot_count, self.robot_count)
+        return robots, traffic_manager
+
+    def matches_graph(self, graph) -> bool:
+        """Check whether the snapshot was taken on the given navigation graph"""
+        return self.graph_signature is None or self.graph_signature == graph_signature(graph)
+
+    def to_bytes(self) -> bytes:
+        """Encode the snapshot as a compressed binary blob"""
+        payload = zlib.compress(pickle.dumps(
+            (self.robot_fields, self.robot_states, self.traffic_state, self.robot_count,
+             self.graph_signature, self.tick, self.gave_way_at),
+            protocol=pickle.HIGHEST_PROTOCOL,
+        ))
+        return _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, self.created_at, len(payload)) + payload
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        """Decode a blob produced by to_bytes(). Raises ValueError for anything else, e.g. a cut-off file."""
+        if len(data) < _HEADER.size:
+            raise ValueError("Truncated fleet snapshot")
+        magic, version, created_at, length = _HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("Not a fleet snapshot")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {version}")
+        payload = data[_HEADER.size:_HEADER.size + length]
+        if len(payload) < length:
+            raise ValueError("Truncated fleet snapshot")
+        try:
+            (fields, robot_states, traffic_state, robot_count, signature, tick,
+             gave_way_at) = pickle.loads(zlib.decompress(payload))
+        except (zlib.error, pickle.UnpicklingError, EOFError, TypeError) as e:
+            raise ValueError(f"Corrupt fleet snapshot: {e}")
+        return cls(robot_states, traffic_state, robot_count, signature, tick, created_at, fields, gave_way_at)
+
+
+def graph_signature(graph) -> str:
+    """Content hash of a navigation graph so snapshots are not restored onto another map"""
+    return graph.signature()
+
+
+def write_snapshot(snapshot: FleetSnapshot, file_path: str):
+    """Write a snapshot atomically so a crash never leaves a half-written file"""
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(snapshot.to_bytes())
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, file_path)
+
+
+def load_snapshot(file_path: str) -> Optional[FleetSnapshot]:
+    """Load a snapshot from disk, or None if there is none"""
+    try:
+        with open(file_path, "rb") as file:
+            return FleetSnapshot.from_bytes(file.read())
+    except FileNotFoundError:
+        return None
+
+
+def list_snapshot_history(history_dir: str) -> List[Tuple[int, str]]:
+    """List (tick, path) for the tick-stamped snapshots in a history directory, oldest first"""
+    if not os.path.isdir(history_dir):
+        return []
+    history = []
+    for name in os.listdir(history_dir):
+        if name.startswith("fleet_") and name.endswith(".snap"):
+            try:
+                history.append((int(name[len("fleet_"):-len(".snap")]), os.path.join(history_dir, name)))
+            except ValueError:
+                continue
+    return sorted(history)
+
+
+class SnapshotWriter:
+    """Encodes and writes snapshots on a background thread.
+
+    The main loop only captures state (a shallow copy); compression and disk I/O
+    happen off the main thread. If a new snapshot arrives before the previous one
+    is written, the older one is dropped.
+
+    With history_name set, every snapshot is also kept as fleet_<tick>.snap in
+    that subdirectory so the replay engine can seek to it.
+    """
+
+    def __init__(self, snapshot_dir="snapshots", interval=5.0, file_name="fleet.snap", history_name=None):
+        self.snapshot_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), snapshot_dir)
+        self.file_path = os.path.join(self.snapshot_dir, file_name)
+        self.history_dir = os.path.join(self.snapshot_dir, history_name) if history_name else None
+        self.interval = interval
+        self.last_capture_time = 0
+        self._pending = None
+        self._condition = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="SnapshotWriter", daemon=True)
+        self._thread.start()
+
+    def is_due(self) -> bool:
+        """Check if the periodic interval has elapsed since the last capture"""
+        return time.time() - self.last_capture_time >= self.interval
+
+    def submit(self, snapshot: FleetSnapshot):
+        """Queue a snapshot for writing"""
+        self.last_capture_time = time.time()
+        with self._condition:
+            self._pending = snapshot
+            self._condition.notify()
+
+    def load_latest(self) -> Optional[FleetSnapshot]:
+        """Load the most recently written snapshot"""
+        return load_snapshot(self.file_path)
+
+    def stop(self):
+        """Flush any pending snapshot and stop the writer thread"""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self._thread.join()
+
+    def _run(self):
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        if self.history_dir:
+            os.makedirs(self.history_dir, exist_ok=True)
+        while True:
+            with self._condition:
+                while self._pending is None and self._running:
+                    self._condition.wait()
+                snapshot, self._pending = self._pending, None
+                running = self._running
+            if snapshot is not None:
+                try:
+                    write_snapshot(snapshot, self.file_path)
+                    if self.history_dir:
+                        write_snapshot(snapshot, os.path.join(self.history_dir, f"fleet_{snapshot.tick:08d}.snap"))
+                except OSError as e:
+                    print(f"Error writing snapshot: {e}")
+            if not running:
+                return
@@ -0,0 +1,200 @@
+import asyncio
+import json
+import queue as queue_module
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.models.robot import Robot
+
+# Statuses travel as small integers
+STATUS_CODES = [Robot.STATUS_IDLE, Robot.STATUS_MOVING, Robot.STATUS_WAITING,
+                Robot.STATUS_CHARGING, Robot.STATUS_COMPLETE, Robot.STATUS_BLOCKED]
+STATUS_INDEX = {status: i for i, status in enumerate(STATUS_CODES)}  # status -> code
+
+
+class StateDeltaEncoder:
+    """Turns the simulation state into compact per-tick deltas.
+
+    Message keys:
+        t   tick
+        k   1 on keyframes (full state), absent on deltas
+        r   [[robot_id, qx, qy, status_code], ...] robots that changed
+        x   [robot_id, ...] robots that disappeared
+        lo  [[start, end, [robot_ids]], ...] lanes whose occupants changed
+        lf  [[start, end], ...] lanes that became free
+        vo  [[vertex, robot_id], ...] vertices whose holder changed
+        vf  [vertex, ...] vertices that became free
+    Positions are quantized to integer multiples of `quantum`.
+    """
+
+    def __init__(self, simulation, quantum=0.01, keyframe_interval=100):
+        self.simulation = simulation
+        self.quantum = quantum
+        self.keyframe_interval = keyframe_interval
+        self._robots: Dict[str, Tuple[int, int, int]] = {}
+        self._lanes: Dict[Tuple[int, int], Tuple[str, ...]] = {}
+        self._vertices: Dict[int, str] = {}
+
+    def _robot_key(self, robot) -> Tuple[int, int, int]:
+        return (round(robot.x / self.quantum), round(robot.y / self.quantum),
+                STATUS_INDEX.get(robot.status, -1))
+
+    def keyframe(self) -> Dict:
+        """Full state in the delta format, without touching the delta baseline"""
+        traffic_manager = self.simulation.traffic_manager
+        message = {
+            "t": self.simulation.tick,
+            "k": 1,
+            "r": [[robot.id, *self._robot_key(robot)] for robot in self.simulation.robots],
+            "lo": [[lane[0], lane[1], list(ids)] for lane, ids in traffic_manager.get_occupied_lanes().items()],
+            "vo": [[vertex, robot_id] for vertex, robot_id in traffic_manager.get_occupied_vertices().items()],
+        }
+        return message
+
+    def reset_baseline(self):
+        """Take the current state as the baseline of the next delta, e.g. when nobody saw the ticks since the last one"""
+        traffic_manager = self.simulation.traffic_manager
+        self._robots = {robot.id: self._robot_key(robot) for robot in self.simulation.robots}
+        self._lanes = {lane: tuple(ids) for lane, ids in traffic_manager.get_occupied_lanes().items()}
+        self._vertices = dict(traffic_manager.get_occupied_vertices())
+
+    def encode_tick(self) -> Optional[Dict]:
+        """Delta since the previous call, a keyframe every keyframe_interval ticks, or None if nothing changed"""
+        tick = self.simulation.tick
+        message: Dict = {"t": tick}
+
+        changed = []
+        seen = set()
+        for robot in self.simulation.robots:
+            seen.add(robot.id)
+            key = self._robot_key(robot)
+            if self._robots.get(robot.id) != key:
+                self._robots[robot.id] = key
+                changed.append([robot.id, *key])
+        removed = [robot_id for robot_id in self._robots if robot_id not in seen]
+        for robot_id in removed:
+            del self._robots[robot_id]
+        if changed:
+            message["r"] = changed
+        if removed:
+            message["x"] = removed
+
+        traffic_manager = self.simulation.traffic_manager
+        lanes = {lane: tuple(ids) for lane, ids in traffic_manager.get_occupied_lanes().items()}
+        lanes_changed = [[lane[0], lane[1], list(ids)] for lane, ids in lanes.items()
+                         if self._lanes.get(lane) != ids]
+        lanes_freed = [[lane[0], lane[1]] for lane in self._lanes if lane not in lanes]
+        self._lanes = lanes
+        if lanes_changed:
+            message["lo"] = lanes_changed
+        if lanes_freed:
+            message["lf"] = lanes_freed
+
+        vertices = dict(traffic_manager.get_occupied_vertices())
+        vertices_changed = [[vertex, robot_id] for vertex, robot_id in vertices.items()
+                            if self._vertices.get(vertex) != robot_id]
+        vertices_freed = [vertex for vertex in self._vertices if vertex not in vertices]
+        self._vertices = vertices
+        if vertices_changed:
+            message["vo"] = vertices_changed
+        if vertices_freed:
+            message["vf"] = vertices_freed
+
+        if self.keyframe_interval and tick % self.keyframe_interval == 0:
+            return self.keyframe()
+        return message if len(message) > 1 else None
+
+
+class StatePublisher:
+    """Fans encoded ticks out to any number of viewer queues.
+
+    Each message is serialized once and the same bytes go to every viewer, so
+    the per-viewer cost is a queue put. A viewer whose queue is full is resynced
+    with a keyframe instead of being disconnected. Late joiners start from a
+    keyframe.
+    """
+
+    def __init__(self, encoder: StateDeltaEncoder, queue_factory, max_queue=256):
+        self.encoder = encoder
+        self.queue_factory = queue_factory  # e.g. asyncio.Queue or queue.Queue
+        self.max_queue = max_queue
+        self.subscribers: Set = set()
+        self._needs_keyframe: Set = set()
+        self.bytes_sent = 0
+
+    @staticmethod
+    def serialize(message: Dict) -> bytes:
+        return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+    def subscribe(self):
+        """Register a viewer and return its queue, primed with a keyframe"""
+        if not self.subscribers:
+            # Nothing was encoded while nobody watched, so the baseline is as old as the last viewer
+            self.encoder.reset_baseline()
+        queue = self.queue_factory(maxsize=self.max_queue)
+        queue.put_nowait(self.serialize(self.encoder.keyframe()))
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+        self._needs_keyframe.discard(queue)
+
+    def publish(self):
+        """Encode the current tick and deliver it. Call once per simulation tick."""
+        message = self.encoder.encode_tick()
+        if message is None and not self._needs_keyframe:
+            return
+        data = self.serialize(message) if message is not None else None
+        keyframe_data = None
+        for queue in list(self.subscribers):
+            payload = data
+            if queue in self._needs_keyframe:
+                if keyframe_data is None:
+                    keyframe_data = self.serialize(self.encoder.keyframe())
+                payload = keyframe_data
+            if payload is None:
+                continue
+            try:
+                queue.put_nowait(payload)
+                self._needs_keyframe.discard(queue)
+                self.bytes_sent += len(payload)
+            except (asyncio.QueueFull, queue_module.Full):
+                # Queue full: drop the backlog and resync this viewer on the next tick
+                while not queue.empty():
+                    queue.get_nowait()
+                self._needs_keyframe.add(queue)
+
+
+class ViewerState:
+    """Client-side mirror of the fleet rebuilt from keyframes and deltas"""
+
+    def __init__(self, quantum=0.01):
+        self.quantum = quantum
+        self.tick = None
+        self.robots: Dict[str, Tuple[float, float, str]] = {}  # robot_id -> (x, y, status)
+        self.occupied_lanes: Dict[Tuple[int, int], List[str]] = {}
+        self.occupied_vertices: Dict[int, str] = {}
+
+    def apply(self, message: Dict) -> bool:
+        """Apply a message. Returns False for deltas received before the first keyframe."""
+        if message.get("k"):
+            self.robots = {}
+            self.occupied_lanes = {}
+            self.occupied_vertices = {}
+        elif self.tick is None:
+            return False
+        self.tick = message["t"]
+        for robot_id, qx, qy, status_code in message.get("r", ()):
+            status = STATUS_CODES[status_code] if 0 <= status_code < len(STATUS_CODES) else None
+            self.robots[robot_id] = (qx * self.quantum, qy * self.quantum, status)
+        for robot_id in message.get("x", ()):
+            self.robots.pop(robot_id, None)
+        for start, end, robot_ids in message.get("lo", ()):
+            self.occupied_lanes[(start, end)] = robot_ids
+        for start, end in message.get("lf", ()):
+            self.occupied_lanes.pop((start, end), None)
+        for vertex, robot_id in message.get("vo", ()):
+            self.occupied_vertices[vertex] = robot_id
+        for vertex in message.get("vf", ()):
+            self.occupied_vertices.pop(vertex, None)
+        return True
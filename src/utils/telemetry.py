@@ -0,0 +1,278 @@
+import json
+import os
+import struct
+import sys
+import zlib
+from array import array
+from datetime import datetime
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from src.utils.state_stream import STATUS_CODES, STATUS_INDEX
+
+TELEMETRY_MAGIC = b"FLTM"
+TELEMETRY_VERSION = 1
+# magic, version, position quantum, idle sampling interval
+_FILE_HEADER = struct.Struct("<4sHdI")
+# first tick, last tick, row count
+_CHUNK_HEADER = struct.Struct("<qqI")
+
+COLUMNS = ("tick", "robot", "x", "y", "status", "lane_start", "lane_end")
+_BLOCKS = len(COLUMNS) + 1  # The robot ID table, then one block per column
+_BLOCK_LENGTHS = struct.Struct(f"<{_BLOCKS}I")
+
+
+def _delta_encode(values: array) -> bytes:
+    deltas = array("i", [values[0]] if values else [])
+    deltas.extend(b - a for a, b in zip(values, values[1:]))
+    if sys.byteorder == "big":
+        deltas.byteswap()  # Stored little-endian
+    return zlib.compress(deltas.tobytes())
+
+
+def _delta_decode(block: bytes) -> List[int]:
+    deltas = array("i")
+    deltas.frombytes(zlib.decompress(block))
+    if sys.byteorder == "big":
+        deltas.byteswap()
+    return list(accumulate(deltas))
+
+
+class TelemetryRecorder:
+    """Appends per-tick robot positions, status and lane to a columnar telemetry file.
+
+    Samples are buffered in memory and written as one chunk per chunk_ticks ticks.
+    A chunk holds its rows ordered by robot, then tick, as columns of
+    delta-encoded integers, each compressed on its own so readers can decode
+    only the columns they need. Positions are stored as multiples of quantum.
+
+    A robot that has not moved, changed status or changed lane since its last
+    sample is only sampled every idle_interval ticks; readers hold its last
+    sample until the next one. Every robot is sampled at the start of a chunk,
+    so each chunk can be read without the ones before it.
+    """
+
+    def __init__(self, file_path, quantum=0.1, chunk_ticks=600, idle_interval=10):
+        self.file_path = file_path
+        self.quantum = quantum
+        self.chunk_ticks = chunk_ticks
+        self.idle_interval = max(1, idle_interval)
+        self._first_tick: Optional[int] = None
+        self._last_tick = 0
+        self._rows: Dict[str, List[Tuple[int, int, int, int, int, int]]] = {}  # robot_id -> samples
+        self._last_sample: Dict[str, Tuple[int, Tuple[int, int, int, int, int]]] = {}
+        new_file = not os.path.exists(file_path) or os.path.getsize(file_path) == 0
+        if not new_file:
+            with open(file_path, "rb") as file:
+                # Appending keeps the file's settings
+                _, self.quantum, self.idle_interval = _read_file_header(file)
+        self._file = open(file_path, "ab")
+        if new_file:
+            self._file.write(_FILE_HEADER.pack(TELEMETRY_MAGIC, TELEMETRY_VERSION, self.quantum,
+                                               self.idle_interval))
+
+    @classmethod
+    def for_session(cls, log_dir="logs", timestamp=None, **options):
+        """Create a telemetry file for a new session next to the event logs"""
+        log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), log_dir)
+        os.makedirs(log_dir, exist_ok=True)
+        timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+        return cls(os.path.join(log_dir, f"telemetry_{timestamp}.tlm"), **options)
+
+    def record(self, tick: int, robots: Iterable):
+        """Sample the fleet at a tick"""
+        if self._first_tick is not None and tick - self._first_tick >= self.chunk_ticks:
+            self.flush()
+        if self._first_tick is None:
+            self._first_tick = tick
+            self._last_sample = {}  # Sample everyone at the start of a chunk
+        self._last_tick = tick
+        quantum = self.quantum
+        for robot in robots:
+            lane = robot.current_lane
+            key = (round(robot.x / quantum), round(robot.y / quantum), STATUS_INDEX.get(robot.status, -1),
+                   lane[0] if lane is not None else -1, lane[1] if lane is not None else -1)
+            last = self._last_sample.get(robot.id)
+            if last is not None and last[1] == key and tick - last[0] < self.idle_interval:
+                continue
+            self._last_sample[robot.id] = (tick, key)
+            self._rows.setdefault(robot.id, []).append((tick,) + key)
+
+    def flush(self):
+        """Write the buffered samples as a chunk"""
+        if self._first_tick is None:
+            return
+        robot_ids = list(self._rows)
+        columns = [array("i") for _ in COLUMNS]
+        for index, robot_id in enumerate(robot_ids):
+            for tick, qx, qy, status, lane_start, lane_end in self._rows[robot_id]:
+                for column, value in zip(columns, (tick, index, qx, qy, status, lane_start, lane_end)):
+                    column.append(value)
+        blocks = [zlib.compress(json.dumps(robot_ids, separators=(",", ":")).encode())]
+        blocks.extend(_delta_encode(column) for column in columns)
+        self._file.write(_CHUNK_HEADER.pack(self._first_tick, self._last_tick, len(columns[0])))
+        self._file.write(_BLOCK_LENGTHS.pack(*(len(block) for block in blocks)))
+        for block in blocks:
+            self._file.write(block)
+        self._file.flush()
+        self._first_tick = None
+        self._rows = {}
+
+    def close(self):
+        """Write any buffered samples and close the file"""
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+
+def _read_file_header(file) -> Tuple[int, float, int]:
+    header = file.read(_FILE_HEADER.size)
+    if len(header) < _FILE_HEADER.size:
+        raise ValueError("Truncated telemetry file")
+    magic, version, quantum, idle_interval = _FILE_HEADER.unpack(header)
+    if magic != TELEMETRY_MAGIC:
+        raise ValueError("Not a telemetry file")
+    if version != TELEMETRY_VERSION:
+        raise ValueError(f"Unsupported telemetry version: {version}")
+    return version, quantum, idle_interval
+
+
+class _Chunk:
+    """Location of one chunk in a telemetry file"""
+
+    def __init__(self, first_tick, last_tick, rows, offset, block_lengths):
+        self.first_tick = first_tick
+        self.last_tick = last_tick
+        self.rows = rows
+        self.offset = offset  # Start of the first block
+        self.block_lengths = block_lengths
+
+
+class TelemetryReader:
+    """Time-window reads from a file written by TelemetryRecorder.
+
+    Opening a file only walks the chunk headers; a read decompresses just the
+    chunks that overlap the window and just the columns asked for.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.chunks: List[_Chunk] = []
+        with open(file_path, "rb") as file:
+            _, self.quantum, self.idle_interval = _read_file_header(file)
+            while True:
+                header = file.read(_CHUNK_HEADER.size + _BLOCK_LENGTHS.size)
+                if len(header) < _CHUNK_HEADER.size + _BLOCK_LENGTHS.size:
+                    break  # End of file, or a chunk cut short by a crash
+                first_tick, last_tick, rows = _CHUNK_HEADER.unpack_from(header)
+                block_lengths = _BLOCK_LENGTHS.unpack_from(header, _CHUNK_HEADER.size)
+                offset = file.tell()
+                file.seek(sum(block_lengths), os.SEEK_CUR)
+                if file.tell() > os.fstat(file.fileno()).st_size:
+                    break
+                self.chunks.append(_Chunk(first_tick, last_tick, rows, offset, block_lengths))
+
+    def tick_range(self) -> Optional[Tuple[int, int]]:
+        """First and last recorded tick, or None for an empty file"""
+        if not self.chunks:
+            return None
+        return self.chunks[0].first_tick, self.chunks[-1].last_tick
+
+    def _chunks_in(self, start_tick, end_tick) -> List[_Chunk]:
+        return [chunk for chunk in self.chunks
+                if (start_tick is None or chunk.last_tick >= start_tick)
+                and (end_tick is None or chunk.first_tick <= end_tick)]
+
+    def _decode(self, file, chunk: _Chunk, columns: Sequence[str]) -> Tuple[List[str], Dict[str, List[int]]]:
+        """Robot ID table and the requested raw columns of a chunk"""
+        blocks = {}
+        offset = chunk.offset
+        for index, length in enumerate(chunk.block_lengths):
+            name = "ids" if index == 0 else COLUMNS[index - 1]
+            if name == "ids" or name in columns:
+                file.seek(offset)
+                blocks[name] = file.read(length)
+            offset += length
+        robot_ids = json.loads(zlib.decompress(blocks.pop("ids")))
+        return robot_ids, {name: _delta_decode(block) for name, block in blocks.items()}
+
+    def read(self, start_tick=None, end_tick=None, columns: Sequence[str] = COLUMNS,
+             robot_ids: Optional[Iterable[str]] = None) -> Dict[str, list]:
+        """Samples with start_tick <= tick <= end_tick, as column name -> values.
+
+        Robots are only sampled when something changes or every idle_interval
+        ticks, so each robot's last sample before start_tick is included too
+        (with its own tick) unless it has one at start_tick; a robot standing
+        still through the window is not missing from it.
+
+        robot holds robot IDs, x and y positions, status the status names, and
+        lane_start / lane_end the lane being driven or -1. Rows are ordered by
+        chunk, then robot, then tick.
+        """
+        wanted = set(columns) | {"tick", "robot"}
+        wanted_ids = set(robot_ids) if robot_ids is not None else None
+        result: Dict[str, list] = {name: [] for name in COLUMNS if name in columns}
+        chunks = self._chunks_in(start_tick, end_tick)
+        # Every robot is sampled at the start of a chunk, so the last chunk begun before the window has them all
+        carry = None
+        if start_tick is not None:
+            carry = next((chunk for chunk in reversed(self.chunks) if chunk.first_tick < start_tick), None)
+            if carry is not None and carry not in chunks and (end_tick is None or start_tick <= end_tick):
+                chunks.insert(0, carry)  # The window starts in a gap between chunks
+        with open(self.file_path, "rb") as file:
+            for chunk in chunks:
+                ids, raw = self._decode(file, chunk, [name for name in COLUMNS if name in wanted])
+                ticks, robots = raw["tick"], raw["robot"]
+                rows = []
+                for i, tick in enumerate(ticks):
+                    if wanted_ids is not None and ids[robots[i]] not in wanted_ids:
+                        continue
+                    if (start_tick is None or tick >= start_tick) and (end_tick is None or tick <= end_tick):
+                        rows.append(i)
+                    elif (chunk is carry and start_tick - self.idle_interval < tick < start_tick
+                          and (i + 1 == len(ticks) or robots[i + 1] != robots[i] or ticks[i + 1] > start_tick)):
+                        rows.append(i)  # Last sample before the window, still held at its start
+                for name, values in result.items():
+                    column = raw[name]
+                    if name == "robot":
+                        values.extend(ids[column[i]] for i in rows)
+                    elif name in ("x", "y"):
+                        values.extend(column[i] * self.quantum for i in rows)
+                    elif name == "status":
+                        values.extend(STATUS_CODES[column[i]] if 0 <= column[i] < len(STATUS_CODES) else None
+                                      for i in rows)
+                    else:
+                        values.extend(column[i] for i in rows)
+        return result
+
+    def trajectory(self, robot_id, start_tick=None, end_tick=None) -> List[Tuple[int, float, float, str]]:
+        """(tick, x, y, status) samples of one robot, for playback"""
+        data = self.read(start_tick, end_tick, ("tick", "x", "y", "status"), robot_ids=[robot_id])
+        return sorted(zip(data["tick"], data["x"], data["y"], data["status"]))
+
+    def heatmap(self, cell_size, start_tick=None, end_tick=None) -> Dict[Tuple[int, int], int]:
+        """Robot-ticks spent in each cell_size square, (cell_x, cell_y) -> ticks.
+
+        A sample counts for every tick until the robot's next sample, so
+        downsampled idle robots weigh as much as if they had been sampled every
+        tick. A robot's last sample counts for at most idle_interval ticks, as
+        it may have been removed.
+        """
+        cells: Dict[Tuple[int, int], int] = {}
+        scale = self.quantum / cell_size
+        with open(self.file_path, "rb") as file:
+            for chunk in self._chunks_in(start_tick, end_tick):
+                _, raw = self._decode(file, chunk, ("tick", "robot", "x", "y"))
+                ticks, robots, xs, ys = raw["tick"], raw["robot"], raw["x"], raw["y"]
+                window_start = chunk.first_tick if start_tick is None else max(start_tick, chunk.first_tick)
+                window_end = chunk.last_tick if end_tick is None else min(end_tick, chunk.last_tick)
+                for i, tick in enumerate(ticks):
+                    # Held until the robot's next sample
+                    until = ticks[i + 1] if i + 1 < len(ticks) and robots[i + 1] == robots[i] \
+                        else min(tick + self.idle_interval, chunk.last_tick + 1)
+                    held = min(until, window_end + 1) - max(tick, window_start)
+                    if held > 0:
+                        cell = (int(xs[i] * scale // 1), int(ys[i] * scale // 1))
+                        cells[cell] = cells.get(cell, 0) + held
+        return cells
@@ -0,0 +1,87 @@
+import json
+import os
+import random
+
+import pytest
+
+from src.models.fleet_simulation import FleetSimulation
+from src.models.nav_graph import NavGraph
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+SCALE = 40  # Graph units to simulation units, as for headless runs
+
+
+@pytest.fixture
+def graph_path():
+    """The small sample navigation graph"""
+    return os.path.join(DATA_DIR, "nav_graph_1.json")
+
+
+@pytest.fixture
+def nav_graph(graph_path):
+    return NavGraph(graph_path)
+
+
+@pytest.fixture
+def grid_graph(tmp_path):
+    """Build a size x size grid graph with two-way lanes and slightly jittered vertices"""
+    def build(size, seed=0):
+        rng = random.Random(seed)
+        vertices = [[x + rng.uniform(-0.1, 0.1), y + rng.uniform(-0.1, 0.1), {"name": f"v{x}_{y}"}]
+                    for x in range(size) for y in range(size)]
+        lanes = []
+        for x in range(size):
+            for y in range(size):
+                vertex = x * size + y
+                for neighbor in ([vertex + 1] if y + 1 < size else []) + ([vertex + size] if x + 1 < size else []):
+                    lanes.append([vertex, neighbor, {"speed_limit": 0}])
+                    lanes.append([neighbor, vertex, {"speed_limit": 0}])
+        path = tmp_path / f"grid_{size}_{seed}.json"
+        path.write_text(json.dumps({"levels": {"level1": {"vertices": vertices, "lanes": lanes}}}))
+        return NavGraph(str(path))
+
+    return build
+
+
+@pytest.fixture
+def scaled_vertices():
+    """Vertex positions of a graph in simulation units"""
+    def build(graph):
+        return {i: (x * SCALE, y * SCALE) for i, (x, y, name) in enumerate(graph.vertices)}
+
+    return build
+
+
+@pytest.fixture
+def make_simulation(scaled_vertices):
+    """Build a FleetSimulation on a graph scaled to simulation units"""
+    def build(graph, **options):
+        return FleetSimulation(graph, scaled_vertices(graph), **options)
+
+    return build
+
+
+@pytest.fixture
+def simulation(make_simulation, nav_graph):
+    return make_simulation(nav_graph)
+
+
+@pytest.fixture
+def run_fleet():
+    """Spawn robots, keep them busy with random tasks for some ticks. Returns completed task count."""
+    def run(simulation, robots, ticks, seed):
+        rng = random.Random(seed)
+        vertex_count = len(simulation.graph.vertices)
+        for _ in range(robots):
+            simulation.spawn_robot(rng.randrange(vertex_count))
+        completed = 0
+        for _ in range(ticks):
+            for robot in simulation.robots:
+                if robot.status == robot.STATUS_IDLE:
+                    simulation.assign_task(robot, rng.randrange(vertex_count))
+            for robot, old_status in simulation.step():
+                if robot.status == robot.STATUS_COMPLETE:
+                    completed += 1
+        return completed
+
+    return run
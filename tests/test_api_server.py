@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+import pytest
+
+from src.api.server import FleetAPIServer
+
+
+@pytest.fixture
+def send_request(simulation):
+    """Send one raw HTTP request to a fresh server. Returns (status, JSON body)."""
+    def send(raw: bytes):
+        async def exchange():
+            server = FleetAPIServer(simulation, port=0, tick_interval=60)
+            await server.start()
+            try:
+                reader, writer = await asyncio.open_connection(server.host, server.port)
+                writer.write(raw)
+                await writer.drain()
+                response = await reader.read()
+                writer.close()
+            finally:
+                await server.stop()
+            head, _, body = response.partition(b"\r\n\r\n")
+            return int(head.split()[1]), json.loads(body)
+
+        return asyncio.run(exchange())
+
+    return send
+
+
+@pytest.fixture
+def post(send_request):
+    def send(path, payload):
+        body = json.dumps(payload).encode()
+        return send_request(f"POST {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                       + body)
+
+    return send
+
+
+def test_task_for_non_string_robot_is_an_error_result(post):
+    status, payload = post("/tasks", {"tasks": [{"robot": ["x"], "destination": 1}]})
+    assert status == 200
+    assert payload["results"] == [{"error": "Unknown robot: ['x']"}]
+
+
+def test_bad_content_length_is_a_bad_request(send_request):
+    status, payload = send_request(b"POST /tasks HTTP/1.1\r\nContent-Length: ten\r\n\r\n")
+    assert status == 400
+    assert "Content-Length" in payload["error"]
+
+
+def test_handler_failure_is_an_internal_error(send_request, monkeypatch):
+    def fail(self, body):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(FleetAPIServer, "_get_status", fail)
+    status, payload = send_request(b"GET /status HTTP/1.1\r\nConnection: close\r\n\r\n")
+    assert status == 500
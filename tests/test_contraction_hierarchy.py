@@ -0,0 +1,34 @@
+import pytest
+
+
+def route_length(graph, path):
+    return sum(graph.lane_length(a, b) for a, b in zip(path, path[1:]))
+
+
+@pytest.mark.parametrize("size", [6, 9])
+def test_hierarchy_routes_are_as_short_as_a_star(grid_graph, size):
+    graph = grid_graph(size, seed=size)
+    hierarchy = graph.build_hierarchy(save=False)
+    mismatches = []
+    for source in range(len(graph.vertices)):
+        for target in range(len(graph.vertices)):
+            path = hierarchy.query(source, target)
+            expected = graph.find_shortest_path(source, target)
+            assert path[0] == source and path[-1] == target
+            assert all(b in graph.adjacency_list[a] for a, b in zip(path, path[1:]))
+            if abs(route_length(graph, path) - route_length(graph, expected)) > 1e-9:
+                mismatches.append((source, target))
+    assert mismatches == []
+
+
+def test_hierarchy_matches_a_star_on_sample_graph(nav_graph):
+    hierarchy = nav_graph.build_hierarchy(save=False)
+    for source in range(len(nav_graph.vertices)):
+        for target in range(len(nav_graph.vertices)):
+            expected = nav_graph.find_shortest_path(source, target)
+            path = hierarchy.query(source, target)
+            if expected is None:
+                assert path is None
+            else:
+                assert route_length(nav_graph, path) == pytest.approx(route_length(nav_graph, expected))
+
@@ -0,0 +1,70 @@
+import pytest
+
+from src.models.robot import Robot
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_two_robots_on_small_graph_keep_moving(simulation, run_fleet, seed):
+    completed = run_fleet(simulation, 2, 5000, seed)
+    assert simulation.robots.status_counts().get(Robot.STATUS_BLOCKED, 0) < 2
+    assert completed > 20
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_robots_on_grid_do_not_gridlock(grid_graph, make_simulation, run_fleet, seed):
+    simulation = make_simulation(grid_graph(25))
+    completed = run_fleet(simulation, 10, 5000, seed)
+    blocked = simulation.robots.status_counts().get(Robot.STATUS_BLOCKED, 0)
+    assert blocked < 10
+    assert completed > 100
+
+
+def test_parked_robot_keeps_its_vertex(simulation):
+    robot = simulation.spawn_robot(0)
+    simulation.assign_task(robot, 4)
+    for _ in range(500):
+        simulation.step()
+        if robot.status == Robot.STATUS_IDLE:
+            break
+    assert robot.status == Robot.STATUS_IDLE
+    assert simulation.traffic_manager.occupied_vertices.get(4) == robot.id
+
+
+def test_parked_robot_moves_aside_for_a_robot_sent_to_its_vertex(grid_graph, make_simulation):
+    simulation = make_simulation(grid_graph(4))
+    parked = simulation.spawn_robot(5)
+    robot = simulation.spawn_robot(7)
+    simulation.assign_task(robot, 5)
+    reasons = set()
+    for _ in range(500):
+        simulation.step()
+        if robot.status == Robot.STATUS_BLOCKED:
+            reasons.add(robot.blocked_reason)
+        if robot.status == Robot.STATUS_IDLE:
+            break
+    assert reasons == {"Vertex 5 is occupied"}
+    assert robot.current_vertex == 5 and robot.status == Robot.STATUS_IDLE
+    assert parked.current_vertex in simulation.graph.adjacency_list[5]
+
+
+def test_head_on_robots_are_a_wait_cycle(simulation):
+    traffic_manager = simulation.traffic_manager
+    assert traffic_manager.acquire("A", None, 8)
+    assert traffic_manager.acquire("B", None, 9)
+    assert not traffic_manager.acquire("A", (8, 9), 9)
+    assert not traffic_manager.acquire("B", (9, 8), 8)
+    cycles = traffic_manager.find_wait_cycles()
+    assert len(cycles) == 1 and sorted(cycles[0]) == ["A", "B"]
+
+
+def test_state_does_not_share_lists_with_the_robot(simulation):
+    robot = simulation.spawn_robot(0)
+    simulation.assign_task(robot, 4)
+    robot.stops.append(4)
+    state = robot.get_state()
+    copied = {field: list(value) for field, value in zip(Robot.STATE_FIELDS, state)
+              if field in Robot.LIST_FIELDS}
+    robot.stops.clear()
+    robot.vertex_path.append(5)
+    robot.path.pop()
+    assert {field: value for field, value in zip(Robot.STATE_FIELDS, state) if field in Robot.LIST_FIELDS} == copied
@@ -0,0 +1,50 @@
+import random
+from collections import deque
+
+
+def reachable_by_search(graph, start):
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        vertex = queue.popleft()
+        for neighbor in graph.adjacency_list[vertex]:
+            if neighbor not in seen and (vertex, neighbor) not in graph.closed_lanes:
+                seen.add(neighbor)
+                queue.append(neighbor)
+    return seen
+
+
+def assert_index_matches_search(graph):
+    for start in range(len(graph.vertices)):
+        reachable = reachable_by_search(graph, start)
+        for end in range(len(graph.vertices)):
+            assert graph.is_reachable(start, end) == (end in reachable), (start, end)
+
+
+def test_reachability_follows_closed_and_reopened_lanes(grid_graph):
+    graph = grid_graph(5)
+    lanes = sorted({(start, end) for start in graph.adjacency_list for end in graph.adjacency_list[start]})
+    rng = random.Random(0)
+    closed = rng.sample(lanes, len(lanes) // 2)
+    for lane in closed:
+        graph.close_lane(*lane)
+        assert_index_matches_search(graph)
+    rng.shuffle(closed)
+    for lane in closed:
+        graph.open_lane(*lane)
+        assert_index_matches_search(graph)
+    assert len(graph.reachability.components()) == 1
+
+
+def test_one_way_lane_splits_a_component(grid_graph):
+    graph = grid_graph(3)
+    # Cut vertex 0 (a corner) off except for the lane out of it
+    graph.close_lane(1, 0)
+    graph.close_lane(3, 0)
+    graph.close_lane(0, 3)
+    assert graph.is_reachable(0, 8)
+    assert not graph.is_reachable(8, 0)
+    assert graph.find_path(8, 0) is None
+    graph.open_lane(3, 0)
+    assert graph.is_reachable(8, 0)
+    assert graph.find_path(8, 0)[-1] == 0
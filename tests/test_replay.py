@@ -0,0 +1,42 @@
+import random
+
+from src.utils.event_log import EventLog, ReplayEngine
+from src.utils.snapshot import write_snapshot
+
+SNAPSHOT_TICKS = 100
+CHECKPOINT_TICKS = 50
+
+
+def fleet_state(simulation):
+    return sorted(robot.get_state() for robot in simulation.robots)
+
+
+def test_replay_from_snapshots_matches_the_live_run(grid_graph, make_simulation, tmp_path):
+    graph = grid_graph(6)
+    event_log = EventLog()
+    live = make_simulation(graph, event_log=event_log)
+    rng = random.Random(3)
+    vertices = rng.sample(range(len(graph.vertices)), 14)
+    for vertex in vertices:
+        live.spawn_robot(vertex)
+    history, checkpoints = [], {}
+    gave_way = set()
+    while live.tick < 1500:
+        for robot in live.robots:
+            if robot.status == robot.STATUS_IDLE:
+                live.assign_task(robot, rng.randrange(len(graph.vertices)))
+        if live.tick % CHECKPOINT_TICKS == CHECKPOINT_TICKS - 1:
+            checkpoints[live.tick] = fleet_state(live)
+        live.step()
+        gave_way.update(live.gave_way_at)
+        if live.tick % SNAPSHOT_TICKS == 0:
+            path = str(tmp_path / f"fleet_{live.tick:08d}.snap")
+            write_snapshot(live.capture_snapshot(), path)
+            history.append((live.tick, path))
+    assert gave_way, "the run should make robots give way"
+
+    with_snapshots = ReplayEngine(graph, list(event_log), history)
+    without_snapshots = ReplayEngine(graph, list(event_log))
+    for tick, state in checkpoints.items():
+        assert fleet_state(without_snapshots.state_at(tick)) == state, tick
+        assert fleet_state(with_snapshots.state_at(tick)) == state, tick
@@ -0,0 +1,102 @@
+import random
+
+from src.models.sharded_simulation import ShardedFleetSimulation, ZoneTrafficManager
+
+# Vertices 0-1 are zone 0, 2-3 zone 1 and 4-5 zone 2
+VERTEX_ZONES = {0: 0, 1: 0, 2: 1, 3: 1, 4: 2, 5: 2}
+
+
+def deliver(managers):
+    """Pass every queued message to its zone until nothing is left to send"""
+    while any(manager.outbox for manager in managers):
+        messages = [message for manager in managers for message in manager.outbox]
+        for manager in managers:
+            manager.outbox = []
+        for message in messages:
+            managers[message[1]].receive(message)
+
+
+def make_zones():
+    return [ZoneTrafficManager(zone, VERTEX_ZONES) for zone in range(3)]
+
+
+def test_remote_lane_and_vertex_are_requested_together():
+    managers = make_zones()
+    assert managers[1].acquire("B", None, 3)
+    assert not managers[0].acquire("A", (2, 3), 3)
+    assert len(managers[0].outbox) == 1
+    deliver(managers)
+    assert not managers[0].acquire("A", (2, 3), 3)
+    deliver(managers)
+    assert (2, 3) not in managers[1].occupied_lanes
+    assert not managers[0].remote_held.get("A")
+
+
+def test_granted_part_is_given_back_when_another_zone_refuses():
+    managers = make_zones()
+    assert managers[2].acquire("B", None, 4)
+    # The lane (2, 4) belongs to zone 1, its far vertex to zone 2
+    assert not managers[0].acquire("A", (2, 4), 4)
+    assert len(managers[0].outbox) == 2
+    deliver(managers)
+    assert not managers[0].remote_held.get("A")
+    assert (2, 4) not in managers[1].occupied_lanes
+
+
+def test_grant_after_refusal_is_given_back():
+    managers = make_zones()
+    assert managers[2].acquire("B", None, 4)
+    assert not managers[0].acquire("A", (2, 4), 4)
+    # The refusal from zone 2 arrives before the grant from zone 1
+    managers[0].outbox, messages = [], managers[0].outbox
+    for message in sorted(messages, key=lambda message: -message[1]):
+        managers[message[1]].receive(message)
+    replies = managers[2].outbox + managers[1].outbox
+    managers[1].outbox, managers[2].outbox = [], []
+    for message in replies:
+        managers[message[1]].receive(message)
+    deliver(managers)
+    assert not managers[0].remote_held.get("A")
+    assert (2, 4) not in managers[1].occupied_lanes
+
+
+def test_remote_request_is_granted_once_free():
+    managers = make_zones()
+    assert not managers[0].acquire("A", (2, 3), 3)
+    deliver(managers)
+    assert managers[0].acquire("A", (2, 3), 3)
+    assert managers[1].occupied_lanes[(2, 3)] == ["A"]
+    assert managers[1].occupied_vertices[3] == "A"
+
+
+def test_robot_waiting_on_another_zone_waits_for_its_holder():
+    managers = make_zones()
+    assert managers[1].acquire("B", None, 3)
+    assert not managers[0].acquire("A", (2, 3), 3)
+    deliver(managers)
+    assert not managers[0].acquire("A", (2, 3), 3)
+    assert managers[0].waits_for("A") == ["B"]
+    assert managers[0].wait_ticks["A"] == 2
+    assert "A" not in managers[1].waiting_robots  # Only the robot's own zone tracks its wait
+
+
+def test_zones_keep_moving_robots_across_the_border(grid_graph, scaled_vertices):
+    graph = grid_graph(12)
+    simulation = ShardedFleetSimulation(graph, 2, scaled_vertices(graph), capacity=16)
+    rng = random.Random(0)
+    try:
+        for _ in range(16):
+            simulation.spawn_robot(rng.randrange(len(graph.vertices)))
+        completed = []
+        for tick in range(3000):
+            for robot_id, x, y, status, zone in simulation.robots():
+                if status == "IDLE":
+                    simulation.assign_task(robot_id, rng.randrange(len(graph.vertices)))
+            simulation.step()
+            if tick % 1000 == 999:
+                completed.append(simulation.completed)
+    finally:
+        simulation.close()
+    # A gridlock stops completions dead; a live fleet keeps finishing tasks in every window
+    windows = [after - before for before, after in zip([0] + completed, completed)]
+    assert min(windows) >= 40, windows
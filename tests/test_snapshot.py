@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+from src.models.nav_graph import NavGraph
+from src.utils.snapshot import FleetSnapshot
+
+
+@pytest.fixture
+def snapshot(simulation):
+    simulation.spawn_robot(0)
+    return simulation.capture_snapshot()
+
+
+@pytest.mark.parametrize("keep", [0, 10, 30, -5])
+def test_truncated_snapshot_is_a_value_error(snapshot, keep):
+    data = snapshot.to_bytes()
+    with pytest.raises(ValueError):
+        FleetSnapshot.from_bytes(data[:keep])
+
+
+def test_snapshot_does_not_match_a_moved_graph(snapshot, nav_graph, graph_path, tmp_path):
+    assert snapshot.matches_graph(nav_graph)
+    with open(graph_path) as file:
+        data = json.load(file)
+    data["levels"]["level1"]["vertices"][0][0] += 1.0  # Same vertex and lane counts
+    moved_path = tmp_path / "moved.json"
+    moved_path.write_text(json.dumps(data))
+    assert not snapshot.matches_graph(NavGraph(str(moved_path)))
@@ -0,0 +1,29 @@
+import json
+import queue
+
+from src.utils.state_stream import StateDeltaEncoder, StatePublisher, ViewerState
+
+def drain(viewer_queue, viewer):
+    while not viewer_queue.empty():
+        viewer.apply(json.loads(viewer_queue.get_nowait()))
+
+
+def test_viewer_joining_after_a_gap_sees_the_current_state(simulation):
+    robot = simulation.spawn_robot(0)
+    publisher = StatePublisher(StateDeltaEncoder(simulation, keyframe_interval=0), queue.Queue)
+    first = publisher.subscribe()
+    simulation.step()
+    publisher.publish()
+    publisher.unsubscribe(first)
+    home = (robot.x, robot.y)
+
+    # Moved while nobody watched, then back where the last viewer saw it
+    robot.x, robot.y = home[0] + 100, home[1]
+    second = publisher.subscribe()
+    robot.x, robot.y = home
+    simulation.step()
+    publisher.publish()
+
+    viewer = ViewerState()
+    drain(second, viewer)
+    assert viewer.robots[robot.id][:2] == (round(home[0] / 0.01) * 0.01, round(home[1] / 0.01) * 0.01)
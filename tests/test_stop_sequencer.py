@@ -0,0 +1,52 @@
+import itertools
+import math
+import random
+
+import pytest
+
+from src.models.stop_sequencer import EXACT_STOPS, StopSequencer
+
+
+def random_costs(seed, count, symmetric):
+    """Travel costs between count + 1 random points; vertex 0 is the start"""
+    rng = random.Random(seed)
+    points = [(rng.uniform(0, 100), rng.uniform(0, 100)) for _ in range(count + 1)]
+
+    def cost(a, b):
+        distance = math.dist(points[a], points[b])
+        return distance if symmetric else distance * (1.5 if a < b else 1.0)
+
+    return cost
+
+
+def nearest_insertion_cost(sequencer, stops):
+    matrix = sequencer._matrix([0] + stops)
+    return sequencer.tour_cost(0, sequencer._nearest_insertion(0, stops, matrix)[1:])
+
+
+@pytest.mark.parametrize("symmetric", [True, False])
+def test_small_stop_sets_match_brute_force(symmetric):
+    for seed in range(100):
+        stops = list(range(1, 2 + seed % (EXACT_STOPS - 1)))
+        sequencer = StopSequencer(random_costs(seed, len(stops), symmetric))
+        order = sequencer.sequence(0, stops)
+        assert sorted(order) == stops
+        best = min(sequencer.tour_cost(0, permutation) for permutation in itertools.permutations(stops))
+        assert sequencer.tour_cost(0, order) == pytest.approx(best), seed
+
+
+@pytest.mark.parametrize("count", [5, 12, 25])
+def test_sequence_is_never_worse_than_nearest_insertion(count):
+    for seed in range(20):
+        stops = list(range(1, count + 1))
+        sequencer = StopSequencer(random_costs(seed, count, symmetric=seed % 2 == 0), time_budget=1.0)
+        order = sequencer.sequence(0, stops)
+        assert sorted(order) == stops
+        assert sequencer.tour_cost(0, order) <= nearest_insertion_cost(sequencer, stops) + 1e-9
+
+
+def test_unreachable_stop_goes_last():
+    def cost(a, b):
+        return math.inf if b == 3 and a != 2 else abs(a - b)
+
+    assert StopSequencer(cost).sequence(0, [3, 1, 2]) == [1, 2, 3]
@@ -0,0 +1,31 @@
+from src.models.robot import Robot
+from src.utils.telemetry import TelemetryReader, TelemetryRecorder
+
+
+def record(path, ticks, chunk_ticks=600):
+    """A parked robot and one that moves one unit every tick"""
+    parked = Robot.from_state(("P", 5.0, 5.0, Robot.STATUS_IDLE), ("id", "x", "y", "status"))
+    parked.current_lane = None
+    mover = Robot.from_state(("M", 0.0, 0.0, Robot.STATUS_MOVING), ("id", "x", "y", "status"))
+    mover.current_lane = None
+    recorder = TelemetryRecorder(str(path), chunk_ticks=chunk_ticks, idle_interval=10)
+    for tick in range(ticks):
+        mover.x = float(tick)
+        recorder.record(tick, [parked, mover])
+    recorder.close()
+    return TelemetryReader(str(path))
+
+
+def test_read_includes_robots_last_sampled_before_the_window(tmp_path):
+    reader = record(tmp_path / "run.tlm", 100)
+    data = reader.read(45, 48)
+    assert data["robot"].count("P") == 1
+    assert data["robot"].count("M") == 4
+    assert reader.trajectory("P", 45, 48) == [(40, 5.0, 5.0, Robot.STATUS_IDLE)]
+
+
+def test_read_carries_samples_across_chunks(tmp_path):
+    reader = record(tmp_path / "run.tlm", 100, chunk_ticks=20)
+    assert reader.trajectory("P", 45, 48) == [(40, 5.0, 5.0, Robot.STATUS_IDLE)]
+    assert reader.trajectory("P", 40, 48) == [(40, 5.0, 5.0, Robot.STATUS_IDLE)]
+    assert [sample[0] for sample in reader.trajectory("M", 45, 46)] == [45, 46]
@@ -0,0 +1,112 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from src.models.traffic_manager import TrafficManager
+
+THREADS = 8
+ROUNDS = 1000
+
+
+class YieldingTrafficManager(TrafficManager):
+    """Gives up the GIL between checking a request and granting it, to widen any race window"""
+
+    def _blocked_on(self, lane, vertex_id, robot_id=None):
+        blocked_on = super()._blocked_on(lane, vertex_id, robot_id)
+        time.sleep(0)
+        return blocked_on
+
+
+@pytest.fixture
+def fast_switching():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Switch threads as often as possible to shake out races
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_vertex_has_one_holder_across_threads(fast_switching):
+    traffic_manager = YieldingTrafficManager()
+    inside = {vertex: 0 for vertex in range(3)}
+    counter_lock = threading.Lock()
+    overlaps = []
+
+    def worker(robot_id):
+        for round_index in range(ROUNDS):
+            vertex = round_index % 3
+            if traffic_manager.acquire(robot_id, None, vertex):
+                with counter_lock:
+                    inside[vertex] += 1
+                    if inside[vertex] > 1:
+                        overlaps.append(vertex)
+                time.sleep(0)  # Let the other threads try for it meanwhile
+                with counter_lock:
+                    inside[vertex] -= 1
+                traffic_manager.release_vertex(robot_id, vertex)
+
+    threads = [threading.Thread(target=worker, args=(f"R{i}",)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not overlaps
+    assert traffic_manager.get_occupied_vertices() == {}
+
+
+def test_opposite_lanes_are_never_both_granted(fast_switching):
+    traffic_manager = YieldingTrafficManager()
+    conflicts = []
+
+    def worker(robot_id, lane):
+        reverse = (lane[1], lane[0])
+        for _ in range(ROUNDS):
+            if traffic_manager.acquire(robot_id, lane, None):
+                time.sleep(0)
+                if reverse in traffic_manager.get_occupied_lanes():
+                    conflicts.append(robot_id)
+                traffic_manager.release_lane(robot_id, *lane)
+
+    threads = [threading.Thread(target=worker, args=(f"R{i}", (1, 2) if i % 2 else (2, 1))) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not conflicts
+    assert traffic_manager.get_occupied_lanes() == {}
+
+
+def test_cycle_detection_and_state_capture_run_alongside_waits(fast_switching):
+    traffic_manager = YieldingTrafficManager()
+    assert traffic_manager.acquire("holder", None, 0)
+    errors = []
+    done = threading.Event()
+
+    def waiter(robot_id):
+        try:
+            for round_index in range(ROUNDS):
+                # Always denied, so every round adds then drops a wait
+                traffic_manager.acquire(f"{robot_id}-{round_index % 50}", None, 0)
+                traffic_manager.withdraw(f"{robot_id}-{(round_index + 25) % 50}")
+        except Exception as e:
+            errors.append(e)
+
+    def observer():
+        try:
+            while not done.is_set():
+                traffic_manager.find_wait_cycles()
+                traffic_manager.get_state()
+        except Exception as e:
+            errors.append(e)
+
+    watcher = threading.Thread(target=observer)
+    watcher.start()
+    threads = [threading.Thread(target=waiter, args=(f"R{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    done.set()
+    watcher.join()
+    assert not errors